@@ -1,10 +1,16 @@
+import asyncio
 import logging
 import logging.config
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from src.routes import calls_route
+from src.db import topic_stats
+from src.db.db_client import DatabaseEngine
+from src.processing import call_processor
+from src.routes import calls_route, health_route, topics_route
+from src.telemetry.tracing import LatencyMiddleware
 
 
 
@@ -22,8 +28,60 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Startup work that runs alongside request handling, cancelled on shutdown
+_background_tasks: set = set()
+
 # Include API routers
 app.include_router(calls_route.router)
+app.include_router(health_route.router)
+app.include_router(topics_route.router)
+
+# Request latency per route, timed until streamed bodies finish
+app.add_middleware(LatencyMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint with stage latencies, item counts and token usage."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.on_event("startup")
+async def start_background_sync():
+    """Keep the local calls table in step with Gong."""
+    calls_route.call_sync.start()
+
+
+@app.on_event("startup")
+async def start_request_index_warmup():
+    """Load stored feature requests for near-duplicate matching without holding up startup."""
+    task = asyncio.create_task(call_processor.warm_request_index())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@app.on_event("startup")
+async def build_topic_stats():
+    """Fill the topic leaderboard on first start against a database that predates it."""
+    try:
+        await asyncio.to_thread(topic_stats.rebuild_if_empty)
+    except Exception:
+        logger.exception("Topic leaderboard rebuild failed, run: python -m src.db.topic_stats rebuild")
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    """Stop background workers and close the pooled HTTP connections held by the API clients."""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await calls_route.call_sync.stop()
+    await calls_route.job_queue.stop()
+    await asyncio.gather(*calls_route._processing_tasks, return_exceptions=True)
+    await calls_route.gong_client.close()
+    if DatabaseEngine._async_engine is not None:
+        await DatabaseEngine._async_engine.dispose()
+
 
 # Load index.html
 @app.get("/", response_class=HTMLResponse)
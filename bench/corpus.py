@@ -0,0 +1,107 @@
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+AREAS = ["SSO login", "audit evidence", "Jira integration", "risk register", "policy templates",
+         "vendor questionnaires", "SOC 2 controls", "AWS connector", "user permissions",
+         "dashboard widgets", "CSV exports", "Slack alerts", "ISO 27001 mapping",
+         "control testing", "framework crosswalk", "task reminders", "API tokens",
+         "evidence collection", "GCP connector", "Okta sync"]
+ACTIONS = ["bulk editing of", "scheduled reports for", "custom fields on", "filtering by owner in",
+           "an audit trail for", "dark mode for", "faster loading of", "webhooks for",
+           "approval workflows for", "version history of"]
+MARKERS = ["We really need", "It would be great to have", "Can you add"]
+FILLER = ["Thanks for joining today.", "Let me share my screen.", "We rolled it out last quarter.",
+          "Our auditors were happy with the last cycle.", "I will loop in our security lead.",
+          "That makes sense to me.", "Let's follow up next week."]
+
+# Marks the sentences the fake Azure server treats as feature requests
+REQUEST_PATTERN = r"(?:We really need|It would be great to have|Can you add) ([^.?]+)[.?]"
+
+
+def generate(calls: int = 100, customers: int = 30, topics: int = 50, requests_per_call: int = 3,
+             stored_requests: int = 1000, seed: int = 0) -> dict:
+    """
+    Synthetic corpus: customers with scores, Gong-shaped calls and transcripts
+    that mention `requests_per_call` requests drawn from `topics` request
+    themes, plus already-processed topics and feature requests to seed the
+    database with for the read endpoints.
+    """
+    rng = random.Random(seed)
+    themes = rng.sample([f"{action} {area}" for action in ACTIONS for area in AREAS],
+                        min(topics, len(ACTIONS) * len(AREAS)))
+    customer_rows = [{"name": f"Customer {i:04d}", "score": rng.randint(1, 4)}
+                     for i in range(customers)]
+    start = datetime(2024, 11, 1, tzinfo=timezone.utc)
+
+    call_rows = []
+    for i in range(calls):
+        customer = rng.choice(customer_rows)["name"]
+        monologues = []
+        for turn in range(rng.randint(6, 12)):
+            sentences = [rng.choice(FILLER) for _ in range(rng.randint(1, 3))]
+            monologues.append({"speakerId": f"speaker-{turn % 2}", "sentences": sentences})
+        for theme in rng.sample(themes, min(requests_per_call, len(themes))):
+            request = f"{rng.choice(MARKERS)} {theme}{rng.choice(['', ' soon', ' for our team'])}."
+            rng.choice(monologues)["sentences"].append(request)
+        call_rows.append({
+            "id": f"{7000000000 + i}",
+            "title": f"{customer} sync #{i}",
+            "started": (start + timedelta(hours=i)).isoformat(),
+            "customer_name": customer,
+            "transcript": [{"speakerId": m["speakerId"],
+                            "sentences": [{"start": n * 1000, "end": n * 1000 + 900, "text": text}
+                                          for n, text in enumerate(m["sentences"])]}
+                           for m in monologues],
+        })
+
+    feature_requests = []
+    for i in range(stored_requests):
+        theme = rng.choice(themes)
+        feature_requests.append({
+            "title": theme.capitalize(),
+            "customer_name": rng.choice(customer_rows)["name"],
+            "description": f"{rng.choice(MARKERS)} {theme} (request {i})",
+            "time": (start + timedelta(minutes=i)).isoformat(),
+        })
+
+    return {"customers": customer_rows, "calls": call_rows,
+            "topics": sorted({row["title"] for row in feature_requests}),
+            "feature_requests": feature_requests}
+
+
+def to_gong_call(call: dict) -> dict:
+    """The call as Gong's /calls/extensive returns it."""
+    return {
+        "metaData": {"id": call["id"], "title": call["title"], "started": call["started"]},
+        "context": [{"objects": [{"fields": [{"name": "Name", "value": call["customer_name"]}]}]}],
+    }
+
+
+def to_gong_transcript(call: dict) -> dict:
+    """The call as Gong's /calls/transcript returns it."""
+    return {"callId": call["id"], "transcript": call["transcript"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic benchmark corpus as JSON.")
+    parser.add_argument("output")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--customers", type=int, default=30)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--requests-per-call", type=int, default=3)
+    parser.add_argument("--stored-requests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = generate(args.calls, args.customers, args.topics, args.requests_per_call,
+                      args.stored_requests, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(corpus, f)
+    print(f"Wrote {len(corpus['calls'])} calls and {len(corpus['feature_requests'])} "
+          f"feature requests to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Local stand-ins for Gong and Azure OpenAI used by the benchmark harness.
+
+    uvicorn bench.fakes:gong_app_from_env --factory --port 9001
+    uvicorn bench.fakes:azure_app_from_env --factory --port 9002
+
+Both add FAKE_LATENCY_MS (+-20% jitter) to every request and answer a
+FAKE_429_RATE fraction of them with 429 and a Retry-After header. GET /_stats
+reports request counts and time spent per endpoint.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from bench.corpus import REQUEST_PATTERN, to_gong_call, to_gong_transcript
+
+
+def _add_faults(app: FastAPI, latency_ms: float, error_rate: float, seed: int = 0):
+    rng = random.Random(seed)
+    stats = defaultdict(lambda: {"requests": 0, "rate_limited": 0, "seconds": 0.0})
+
+    @app.middleware("http")
+    async def inject(request: Request, call_next):
+        if request.url.path.startswith("/_stats"):
+            return await call_next(request)
+        key = re.sub(r"/deployments/[^/]+", "/deployments/*", request.url.path)
+        start = time.perf_counter()
+        stats[key]["requests"] += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms * rng.uniform(0.8, 1.2) / 1000)
+        if rng.random() < error_rate:
+            stats[key]["rate_limited"] += 1
+            response = JSONResponse({"error": {"message": "Rate limit exceeded", "code": "429"}},
+                                    status_code=429, headers={"Retry-After": "0.1"})
+        else:
+            response = await call_next(request)
+        stats[key]["seconds"] += time.perf_counter() - start
+        return response
+
+    @app.get("/_stats")
+    async def get_stats():
+        return {key: {**value, "seconds": round(value["seconds"], 3)} for key, value in stats.items()}
+
+    @app.post("/_stats/reset")
+    async def reset_stats():
+        stats.clear()
+
+
+def create_gong_app(corpus: dict, latency_ms: float = 0, error_rate: float = 0,
+                    page_size: int = 100) -> FastAPI:
+    """Serves the corpus calls through Gong's cursor-paginated call and transcript endpoints."""
+    app = FastAPI()
+    _add_faults(app, latency_ms, error_rate)
+    calls = sorted(corpus["calls"], key=lambda call: call["started"])
+
+    def page(items: list, cursor: str | None, key: str) -> dict:
+        offset = int(cursor or 0)
+        body = {key: items[offset:offset + page_size],
+                "records": {"totalRecords": len(items), "currentPageSize": page_size}}
+        if offset + page_size < len(items):
+            body["records"]["cursor"] = str(offset + page_size)
+        return body
+
+    def select(call_filter: dict) -> list:
+        ids = set(call_filter.get("callIds") or [])
+        start, end = call_filter.get("fromDateTime"), call_filter.get("toDateTime")
+        return [call for call in calls
+                if (not ids or call["id"] in ids)
+                and (not start or call["started"] >= start)
+                and (not end or call["started"] < end)]
+
+    @app.post("/v2/calls/extensive")
+    async def extensive(body: dict):
+        return page([to_gong_call(call) for call in select(body.get("filter", {}))],
+                    body.get("cursor"), "calls")
+
+    @app.post("/v2/calls/transcript")
+    async def transcript(body: dict):
+        return page([to_gong_transcript(call) for call in select(body.get("filter", {}))],
+                    body.get("cursor"), "callTranscripts")
+
+    return app
+
+
+def embed(text: str, dims: int = 1536) -> list:
+    """
+    Deterministic bag-of-words embedding: each word is hashed to a signed
+    dimension, so texts sharing words get high cosine similarity.
+    """
+    vector = np.zeros(dims, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dims
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def _completion(content: str, prompt: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                  "total_tokens": (len(prompt) + len(content)) // 4},
+    }
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content)
+    return content or ""
+
+
+def create_azure_app(latency_ms: float = 0, error_rate: float = 0, dims: int = 1536) -> FastAPI:
+    """
+    Answers Azure (and plain OpenAI) embedding and chat completion requests.
+    Extraction prompts get back the corpus request sentences found in the
+    transcript; any other prompt is treated as a title request.
+    """
+    app = FastAPI()
+    _add_faults(app, latency_ms, error_rate)
+
+    async def embeddings(body: dict):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {"object": "list", "model": "fake-embedding",
+                "data": [{"object": "embedding", "index": i, "embedding": embed(text, dims)}
+                         for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": sum(len(text) // 4 for text in inputs)}}
+
+    async def chat(body: dict):
+        messages = body["messages"]
+        prompt = _text(messages[-1]["content"])
+        if "Feature Request Extraction" in _text(messages[0]["content"]):
+            requests = re.findall(REQUEST_PATTERN, prompt)
+            return _completion(json.dumps(requests), prompt)
+        requirements = re.findall(r"^- (.+)$", prompt, re.MULTILINE) or [prompt]
+        title = " ".join(requirements[0].split()[:4]).capitalize()
+        return _completion(f'"{title}"', prompt)
+
+    app.post("/openai/deployments/{deployment}/embeddings")(embeddings)
+    app.post("/openai/deployments/{deployment}/chat/completions")(chat)
+    app.post("/v1/embeddings")(embeddings)
+    app.post("/v1/chat/completions")(chat)
+    return app
+
+
+def _fault_settings() -> dict:
+    return {"latency_ms": float(os.getenv("FAKE_LATENCY_MS", "0")),
+            "error_rate": float(os.getenv("FAKE_429_RATE", "0"))}
+
+
+def gong_app_from_env() -> FastAPI:
+    with open(os.environ["BENCH_CORPUS"], encoding="utf-8") as f:
+        corpus = json.load(f)
+    return create_gong_app(corpus, **_fault_settings())
+
+
+def azure_app_from_env() -> FastAPI:
+    return create_azure_app(**_fault_settings())
@@ -0,0 +1,249 @@
+"""
+Benchmark the API against local fakes of Gong and Azure OpenAI.
+
+    DB_USER=admin DB_PASSWORD=admin DB_HOST=localhost DB_PORT=5432 BENCH_DB_NAME=featbull_bench \
+        python -m bench.run --calls 200 --requests 50 --concurrency 8 --latency-ms 150
+
+The harness writes a synthetic corpus, seeds the BENCH_DB_NAME database with
+it (every table in that database is emptied first), starts the fakes, the app
+and the standalone clustering server as subprocesses, and reports p50/p95
+latency, throughput and the time the app spent waiting on each fake endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from bench import corpus as corpus_module
+from bench.fakes import embed
+from src.db.db_models import Base, Call, Customer, FeatureRequest, Topic
+from src.db.topic_stats import refresh_topics
+from src.topics.topic_matrix import TopicMatrix
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ["calls", "process", "processed", "leaderboard", "cluster"]
+
+
+def seed_database(url: str, corpus: dict):
+    """Recreate the schema in the benchmark database and load the corpus into it."""
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables}"))
+        connection.execute(Customer.__table__.insert(), corpus["customers"])
+        connection.execute(Topic.__table__.insert(), [
+            {"title": title, "embedding": TopicMatrix.encode(embed(title))}
+            for title in corpus["topics"]])
+        connection.execute(FeatureRequest.__table__.insert(), [
+            {**row, "time": datetime.fromisoformat(row["time"])}
+            for row in corpus["feature_requests"]])
+        connection.execute(Call.__table__.insert(), [
+            {"id": call["id"], "title": call["title"], "customer_name": call["customer_name"],
+             "started": datetime.fromisoformat(call["started"]), "synced_at": now}
+            for call in corpus["calls"]])
+        refresh_topics(connection)
+    engine.dispose()
+
+
+@contextmanager
+def servers(specs: list):
+    """Start (name, port, module, env, cwd) uvicorn subprocesses and stop them on exit."""
+    processes = []
+    try:
+        for name, port, target, env, cwd in specs:
+            command = [sys.executable, "-m", "uvicorn", target, "--port", str(port),
+                       "--app-dir", ROOT, "--log-level", "warning"]
+            if target.endswith("_from_env"):
+                command.append("--factory")
+            processes.append(subprocess.Popen(command, env={**os.environ, **env}, cwd=cwd))
+        for name, port, *_ in specs:
+            _wait_for(name, f"http://127.0.0.1:{port}/")
+        yield
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def _wait_for(name: str, url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{name} did not start on {url}")
+
+
+async def run_load(base_url: str, paths: list, concurrency: int) -> dict:
+    """Send the requests `concurrency` at a time and summarize their latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        async def send(path):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*map(send, paths))
+        wall = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(paths),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+        "max_ms": round(float(latencies_ms.max()), 1),
+        "throughput_rps": round(len(paths) / wall, 2),
+    }
+
+
+def _paths(endpoint: str, corpus: dict, count: int) -> list:
+    if endpoint == "process":
+        ids = [call["id"] for call in corpus["calls"]]
+        return [f"/calls/{ids[i % len(ids)]}/process" for i in range(count)]
+    if endpoint == "processed":
+        return ["/calls/processed?limit=50"] * count
+    if endpoint == "leaderboard":
+        return ["/topics/leaderboard?limit=50"] * count
+    if endpoint == "cluster":
+        return ["/cluster-requirements?distance_threshold=1.0"] * count
+    return ["/calls"] * count
+
+
+async def benchmark(args, corpus: dict, ports: dict) -> dict:
+    fakes = [f"http://127.0.0.1:{ports['gong']}", f"http://127.0.0.1:{ports['azure']}"]
+    results = {}
+    for endpoint in args.endpoints:
+        port = ports["cluster"] if endpoint == "cluster" else ports["app"]
+        paths = _paths(endpoint, corpus, args.requests)
+        if args.warmup:
+            await run_load(f"http://127.0.0.1:{port}", paths[:args.warmup], 1)
+        async with httpx.AsyncClient() as client:
+            for fake in fakes:
+                await client.post(f"{fake}/_stats/reset")
+            results[endpoint] = await run_load(f"http://127.0.0.1:{port}", paths, args.concurrency)
+            stages = {}
+            for name, fake in zip(("gong", "azure"), fakes):
+                for path, stats in (await client.get(f"{fake}/_stats")).json().items():
+                    stages[f"{name} {path}"] = stats
+            results[endpoint]["stages"] = stages
+    return results
+
+
+def print_report(results: dict):
+    print(f"{'endpoint':<12}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'max ms':>10}{'req/s':>8}")
+    for endpoint, result in results.items():
+        print(f"{endpoint:<12}{result['requests']:>9}{sum(result['errors'].values()):>8}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['max_ms']:>10}"
+              f"{result['throughput_rps']:>8}")
+        for stage, stats in result["stages"].items():
+            print(f"    {stage}: {stats['requests']} requests, {stats['rate_limited']} rate limited, "
+                  f"{stats['seconds']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against local Gong and Azure fakes.")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--customers", type=int, default=30)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--stored-requests", type=int, default=1000)
+    parser.add_argument("--cluster-requirements", type=int, default=200,
+                        help="Requirements in the file the clustering server reads")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency the fakes add")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of 429s from the fakes")
+    parser.add_argument("--transcript-store", default="none", choices=["none", "postgres", "file"])
+    parser.add_argument("--port", type=int, default=9100, help="First of four consecutive ports")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    database = os.environ.get("BENCH_DB_NAME")
+    if not database:
+        parser.error("set BENCH_DB_NAME to a database the benchmark may empty and reseed")
+    db_env = {"DB_NAME": database}
+    url = "postgresql://{}:{}@{}:{}/{}".format(
+        os.environ["DB_USER"], os.environ["DB_PASSWORD"], os.environ["DB_HOST"],
+        os.environ["DB_PORT"], database)
+
+    corpus = corpus_module.generate(args.calls, args.customers, args.topics,
+                                    stored_requests=args.stored_requests, seed=args.seed)
+    seed_database(url, corpus)
+    ports = {"gong": args.port, "azure": args.port + 1, "app": args.port + 2,
+             "cluster": args.port + 3}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus_path = os.path.join(workdir, "corpus.json")
+        with open(corpus_path, "w", encoding="utf-8") as f:
+            json.dump(corpus, f)
+        # The standalone clustering server reads its key and input from the working directory
+        with open(os.path.join(workdir, "api_key.txt"), "w") as f:
+            f.write("bench")
+        with open(os.path.join(workdir, "customer_requirements.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(row["description"] for row in
+                              corpus["feature_requests"][:args.cluster_requirements]))
+
+        fake_env = {"BENCH_CORPUS": corpus_path, "FAKE_LATENCY_MS": str(args.latency_ms),
+                    "FAKE_429_RATE": str(args.error_rate)}
+        # Client-side quotas far above what the fakes can serve, so they don't cap the benchmark
+        limits_env = {f"OPENAI_{kind}_{deployment}": "1000000000" for kind in ("RPM", "TPM")
+                      for deployment in ("GPT_4", "GPT_3_5_TURBO", "TEXT_EMBEDDING_ADA_002")}
+        app_env = {
+            **db_env,
+            **limits_env,
+            "GONG_BASE_URL": f"http://127.0.0.1:{ports['gong']}/v2",
+            "GONG_USERNAME": "bench", "GONG_PASSWORD": "bench",
+            "GONG_SYNC_INTERVAL_SECONDS": "0",
+            "AZURE_API_BASE": f"http://127.0.0.1:{ports['azure']}",
+            "AZURE_API_KEY": "bench",
+            "TRANSCRIPT_STORE": args.transcript_store,
+            "TRANSCRIPT_STORE_PATH": os.path.join(workdir, "transcripts"),
+        }
+        cluster_env = {**limits_env, "OPENAI_API_BASE": f"http://127.0.0.1:{ports['azure']}/v1"}
+        specs = [
+            ("fake gong", ports["gong"], "bench.fakes:gong_app_from_env", fake_env, ROOT),
+            ("fake azure", ports["azure"], "bench.fakes:azure_app_from_env", fake_env, ROOT),
+            ("app", ports["app"], "app:app", app_env, ROOT),
+            ("clustering server", ports["cluster"], "src.server:app", cluster_env, workdir),
+        ]
+        with servers(specs):
+            results = asyncio.run(benchmark(args, corpus, ports))
+
+    report = {"config": vars(args), "results": results}
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
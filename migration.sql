@@ -1,5 +1,6 @@
 CREATE TABLE topics (
-    title VARCHAR(255) PRIMARY KEY
+    title VARCHAR(255) PRIMARY KEY,
+    embedding BYTEA
 );
 
 CREATE TABLE customers (
@@ -7,15 +8,120 @@ CREATE TABLE customers (
     score INT
 );
 
+CREATE INDEX ix_customers_lower_name ON customers (lower(name));
+
 CREATE TABLE feature_requests (
+    id BIGSERIAL PRIMARY KEY,
     title VARCHAR(255),
     customer_name VARCHAR(255),
-    description VARCHAR(1000) PRIMARY KEY,
+    description VARCHAR(1000) NOT NULL,
     time TIMESTAMP,
+    canonical_description VARCHAR(1000),
     FOREIGN KEY (title) REFERENCES topics(title),
     FOREIGN KEY (customer_name) REFERENCES customers(name)
 );
 
+-- Everything from here to the embeddings table is safe to re-run: on an
+-- existing database, run it on its own to upgrade feature_requests in place.
+ALTER TABLE feature_requests ADD COLUMN IF NOT EXISTS canonical_description VARCHAR(1000);
+
+-- One row per customer and wording, so the same words from two customers are two
+-- requests. Older tables were keyed by description alone and get an id instead.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = current_schema() AND table_name = 'feature_requests'
+                     AND column_name = 'id') THEN
+        ALTER TABLE feature_requests DROP CONSTRAINT IF EXISTS feature_requests_pkey;
+        ALTER TABLE feature_requests ADD COLUMN id BIGSERIAL PRIMARY KEY;
+    END IF;
+END $$;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_feature_requests_description_customer
+    ON feature_requests (description, COALESCE(customer_name, ''));
+
+CREATE INDEX IF NOT EXISTS ix_feature_requests_title ON feature_requests (title);
+CREATE INDEX IF NOT EXISTS ix_feature_requests_customer_name ON feature_requests (customer_name);
+
+-- Near-duplicate requests link to the first request seen with the same meaning.
+CREATE INDEX IF NOT EXISTS ix_feature_requests_canonical_description
+    ON feature_requests (canonical_description);
+
+-- Content-addressed embedding cache: key is sha256(model + normalized text),
+-- vector holds the float32 embedding bytes.
+CREATE TABLE embeddings (
+    key VARCHAR(64) PRIMARY KEY,
+    model VARCHAR(255) NOT NULL,
+    vector BYTEA NOT NULL
+);
+
+-- Chat completion cache: key is sha256 of deployment, api version, messages,
+-- temperature and max_tokens.
+CREATE TABLE llm_responses (
+    key VARCHAR(64) PRIMARY KEY,
+    deployment VARCHAR(255) NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX ix_llm_responses_created_at ON llm_responses (created_at);
+
+-- Local copy of Gong call metadata and transcripts, stored as zlib-compressed
+-- JSON so reprocessing does not go back to Gong.
+CREATE TABLE gong_calls (
+    call_id VARCHAR(64) PRIMARY KEY,
+    call_data BYTEA,
+    transcript BYTEA,
+    call_fetched_at TIMESTAMPTZ,
+    transcript_fetched_at TIMESTAMPTZ
+);
+
+-- Calls synced incrementally from Gong, and the high-water mark of each sync.
+CREATE TABLE calls (
+    id VARCHAR(64) PRIMARY KEY,
+    title VARCHAR(512),
+    started TIMESTAMPTZ NOT NULL,
+    customer_name VARCHAR(255),
+    synced_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX ix_calls_started ON calls (started);
+CREATE INDEX ix_calls_customer_name ON calls (customer_name);
+
+CREATE TABLE sync_state (
+    name VARCHAR(64) PRIMARY KEY,
+    watermark TIMESTAMPTZ,
+    last_run_at TIMESTAMPTZ
+);
+
+-- Per-topic leaderboard and weekly/monthly rollups, refreshed for the touched
+-- topics whenever feature requests or customer scores change. The app fills
+-- them from existing data on startup while topic_stats is empty; rebuild them
+-- by hand after editing tables with SQL: python -m src.db.topic_stats rebuild
+CREATE TABLE topic_stats (
+    title VARCHAR(255) PRIMARY KEY,
+    -- Sum of the scores of the distinct customers asking for the topic, each counted once
+    score INT NOT NULL,
+    -- Canonical requests only; near-duplicates don't add to the count
+    requests INT NOT NULL,
+    customers INT NOT NULL,
+    first_seen TIMESTAMP NOT NULL,
+    last_seen TIMESTAMP NOT NULL
+);
+
+CREATE INDEX ix_topic_stats_rank ON topic_stats (score DESC, title);
+
+CREATE TABLE topic_rollups (
+    period VARCHAR(8),
+    bucket TIMESTAMP,
+    title VARCHAR(255),
+    score INT NOT NULL,
+    requests INT NOT NULL,
+    customers INT NOT NULL,
+    PRIMARY KEY (period, bucket, title)
+);
+
+CREATE INDEX ix_topic_rollups_title ON topic_rollups (title);
+
 
 INSERT INTO customers (name, score) VALUES ('Nylas', 4);
 INSERT INTO customers (name, score) VALUES ('SPORTSBET', 4);
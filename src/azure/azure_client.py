@@ -1,56 +1,238 @@
+import asyncio
 import json
 import logging
 import os
+import re
 from collections import defaultdict
-from typing import List
+from datetime import timedelta
+from typing import Callable, List
 
 import numpy as np
 import openai
-from sklearn.cluster import AgglomerativeClustering
-from sklearn.metrics.pairwise import cosine_similarity
+
+from src.azure.embedding_cache import EmbeddingCache
+from src.azure.llm_cache import LLMResponseCache
+from src.azure.rate_limiter import get_limiter
+from src.gong.transcript import chunk_lines, count_tokens, estimate_tokens, flatten_transcript
+from src.telemetry.tracing import span
+from src.topics.online_clustering import OnlineClusterer
+from src.topics.topic_matrix import TopicMatrix
 
 openai.api_key = os.environ.get('AZURE_API_KEY')
 openai.api_type = "azure"
-openai.api_base = "https://hackathon-ai-2.openai.azure.com/"
+openai.api_base = os.environ.get("AZURE_API_BASE", "https://hackathon-ai-2.openai.azure.com/")
 
 # Configuration
 API_KEY = os.environ.get("AZURE_API_KEY")
+EMBEDDING_DEPLOYMENT = "text-embedding-ada-002"
+# Azure caps embedding requests at 16 inputs and 8191 tokens per input
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_BATCH_TOKENS = int(os.environ.get("EMBEDDING_BATCH_TOKENS", "8000"))
+# GPT-4 has an 8k context: the prompt, one chunk and the completion must fit in it
+EXTRACTION_MAX_TOKENS = int(os.environ.get("EXTRACTION_MAX_TOKENS", "800"))
+TRANSCRIPT_CHUNK_TOKENS = int(os.environ.get("TRANSCRIPT_CHUNK_TOKENS", "6000"))
+TRANSCRIPT_CHUNK_OVERLAP_TOKENS = int(os.environ.get("TRANSCRIPT_CHUNK_OVERLAP_TOKENS", "200"))
+
+EXTRACTION_PROMPT = "Title: Feature Request Extraction for Anecdotes.ai Product Enhancements Instructions: Review Background Material: Familiarize yourself with the existing features and capabilities of the Anecdotes.ai product by visiting the help section on help.anecdotes.ai. Understand the current functionalities offered to GRC managers in tech, healthcare, and finance sectors. Analyze Customer Transcripts: You will be provided with transcripts from customer calls recorded on the Gong platform. Read through these transcripts carefully. Identify Feature Requests: Extract statements or discussions where customers mention specific needs, suggestions, or improvements related to the Anecdotes.ai product. Focus on capturing direct quotes that reflect the customer's voice and specific requests. Categorize Requests: Classify the extracted features into relevant categories such as usability enhancements, new feature suggestions, integration requests, performance improvements, etc. If applicable, note which sector (tech, healthcare, finance) the feature request is most relevant to. Summarize and Report: Create a concise summary of each feature request. Provide context or additional comments from the transcript that help clarify the customer's need or the potential impact of the requested feature. Prioritize for Impact: Optionally, you can add your own assessment of the potential impact or value of each feature request based on the frequency of the request across different transcripts and its relevance to the current market needs. can you share in the following template: JSON file one liner - array of all requests (without category / summary - only the requests) in one liner For example: [\"feature request 1 (\\\"original quote from the customer\\\"),  \"feature request 2\" (\\\"original quote from the customer\\\")......] in one line Context: As a product manager at Anecdotes.ai, your role involves continually enhancing the product to meet the evolving needs of GRC managers in various sectors. The insights gathered from customer calls are crucial for driving product development that is closely aligned with user requirements. Accurate extraction and analysis of feature requests from these calls will directly influence the prioritization and implementation of new features in the Anecdotes.ai roadmap. Your work will contribute to the product's effectiveness and customer satisfaction, ensuring that Anecdotes.ai remains a competitive and valuable tool for GRC managers."
 
 logger = logging.getLogger(__name__)
 
+embedding_cache = EmbeddingCache(
+    EMBEDDING_DEPLOYMENT,
+    maxsize=int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000")),
+    persistent=os.environ.get("EMBEDDING_CACHE_BACKEND", "postgres") == "postgres")
+
+llm_cache = LLMResponseCache(
+    ttl=timedelta(hours=float(os.environ.get("LLM_CACHE_TTL_HOURS", "720"))),
+    max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "50000")),
+    persistent=os.environ.get("LLM_CACHE_BACKEND", "postgres") == "postgres")
+
+
+async def _chat_completion(engine: str, messages: list, max_tokens: int, temperature: float,
+                           api_version: str, use_cache: bool = True,
+                           stage: str = "llm.chat") -> tuple[str, dict]:
+    """Run a chat completion, reusing a cached response for identical requests unless bypassed."""
+    with span(stage, deployment=engine) as current:
+        key = llm_cache.key(engine, api_version, messages, temperature, max_tokens)
+        if use_cache:
+            content = await asyncio.to_thread(llm_cache.get, key)
+            if content is not None:
+                logger.info("LLM cache hit for %s request", engine)
+                current.set("cache_hit", True)
+                return content, {}
 
-def generate_fr_from_call(transcription: str):
+        # Azure charges the prompt plus max_tokens against the TPM quota when it admits a request
+        response = await get_limiter(engine).call(
+            lambda: openai.ChatCompletion.acreate(
+                engine=engine,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                api_version=api_version),
+            tokens=_count_message_tokens(messages) + max_tokens)
+        content = response.get("choices")[0].get("message").get("content")  # type: ignore
+        usage = response.get("usage", {})  # type: ignore
+        current.set("cache_hit", False)
+        current.tokens(usage)
+        await asyncio.to_thread(llm_cache.put, key, engine, content)
+        return content, usage
+
+
+def _count_message_tokens(messages: list) -> int:
+    tokens = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content)
+        tokens += count_tokens(content) + 4
+    return tokens
+
+
+async def generate_fr_from_call(transcription: str, use_cache: bool = True):
+    """Extract the feature requests mentioned in one piece of transcript text."""
     logger.info(f"Generating feature requests from transcription")
-    response = openai.ChatCompletion.create(
+    content, usage = await _chat_completion(
         engine="gpt-4",
         messages=[
             {"role": "system",
-             "content": [{"type": "text", "text": "Title: Feature Request Extraction for Anecdotes.ai Product Enhancements Instructions: Review Background Material: Familiarize yourself with the existing features and capabilities of the Anecdotes.ai product by visiting the help section on help.anecdotes.ai. Understand the current functionalities offered to GRC managers in tech, healthcare, and finance sectors. Analyze Customer Transcripts: You will be provided with transcripts from customer calls recorded on the Gong platform. Read through these transcripts carefully. Identify Feature Requests: Extract statements or discussions where customers mention specific needs, suggestions, or improvements related to the Anecdotes.ai product. Focus on capturing direct quotes that reflect the customer's voice and specific requests. Categorize Requests: Classify the extracted features into relevant categories such as usability enhancements, new feature suggestions, integration requests, performance improvements, etc. If applicable, note which sector (tech, healthcare, finance) the feature request is most relevant to. Summarize and Report: Create a concise summary of each feature request. Provide context or additional comments from the transcript that help clarify the customer's need or the potential impact of the requested feature. Prioritize for Impact: Optionally, you can add your own assessment of the potential impact or value of each feature request based on the frequency of the request across different transcripts and its relevance to the current market needs. can you share in the following template: JSON file one liner - array of all requests (without category / summary - only the requests) in one liner For example: [\"feature request 1 (\\\"original quote from the customer\\\"),  \"feature request 2\" (\\\"original quote from the customer\\\")......] in one line Context: As a product manager at Anecdotes.ai, your role involves continually enhancing the product to meet the evolving needs of GRC managers in various sectors. The insights gathered from customer calls are crucial for driving product development that is closely aligned with user requirements. Accurate extraction and analysis of feature requests from these calls will directly influence the prioritization and implementation of new features in the Anecdotes.ai roadmap. Your work will contribute to the product's effectiveness and customer satisfaction, ensuring that Anecdotes.ai remains a competitive and valuable tool for GRC managers."}]},
+             "content": [{"type": "text", "text": EXTRACTION_PROMPT}]},
             {"role": "user", "content": [
                 {"type": "text", "text": transcription}]}
         ],
-        max_tokens=800,
+        max_tokens=EXTRACTION_MAX_TOKENS,
         temperature=0.7,
-        api_version="2024-02-15-preview")
-    logger.info(response.get(
-        "choices")[0].get("message").get("content"))
-    # return response.get("choices")[0].get("message").get("content")
-    feature_requests = json.loads(response.get(
-        "choices")[0].get("message").get("content"))
-    return feature_requests
-
-
-def _get_embedding(text: str):
-    response = openai.Embedding.create(
-        input=text,
-        engine="text-embedding-ada-002",
-        api_version="2023-05-15"
-    )
-    logger.info(f"Embedding generated for text: {text[:50]}...")
-    return response['data'][0]['embedding']  # type: ignore
+        api_version="2024-02-15-preview",
+        use_cache=use_cache,
+        stage="llm.extract")
+    logger.info(content)
+    logger.info("Extraction used %s prompt and %s completion tokens",
+                usage.get("prompt_tokens"), usage.get("completion_tokens"))
+    return _parse_feature_requests(content)
+
+
+def _parse_feature_requests(content: str) -> List[str]:
+    """Parse the model's JSON array, salvaging the complete items if the output was cut off."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        end = content.rfind('",')
+        if end != -1:
+            try:
+                feature_requests = json.loads(content[:end + 1] + "]")
+                logger.warning(
+                    f"Extraction output was truncated, kept {len(feature_requests)} complete requests.")
+                return feature_requests
+            except json.JSONDecodeError:
+                pass
+        logger.error(f"Could not parse extracted feature requests: {content[:200]}")
+        return []
+
+
+async def extract_feature_requests(call_transcripts: list, use_cache: bool = True) -> List[str]:
+    """
+    Map-reduce extraction over a Gong transcript: flatten it to speaker-tagged
+    lines, split those into overlapping token-budgeted chunks, extract from the
+    chunks concurrently and merge the results without duplicates.
+    """
+    lines = flatten_transcript(call_transcripts)
+    chunks = chunk_lines(lines, TRANSCRIPT_CHUNK_TOKENS, TRANSCRIPT_CHUNK_OVERLAP_TOKENS)
+    logger.info("Transcript tokens: raw=%d, flattened=%d, chunks=%s",
+                count_tokens(str(call_transcripts)), count_tokens("\n".join(lines)),
+                [count_tokens(chunk) for chunk in chunks])
+
+    # The deployment's rate limiter bounds how many of these run at once
+    merged = {}
+    for feature_requests in await asyncio.gather(
+            *(generate_fr_from_call(chunk, use_cache) for chunk in chunks)):
+        for feature_request in feature_requests:
+            key = _dedup_key(feature_request)
+            if key and key not in merged:
+                merged[key] = feature_request
+    logger.info(f"Extracted {len(merged)} distinct feature requests from {len(chunks)} chunks.")
+    return list(merged.values())
+
+
+def _dedup_key(feature_request: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", str(feature_request).casefold()).split())
 
 
-def _generate_group_title(requirements: List[str]) -> str:
+async def _get_embedding(text: str):
+    return (await get_embeddings([text]))[0]
+
+
+def _iter_embedding_batches(texts: List[str], max_items: int = EMBEDDING_BATCH_SIZE,
+                            max_tokens: int = EMBEDDING_BATCH_TOKENS):
+    """Pack texts into batches that respect the per-request item and token limits."""
+    batch = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+async def _embed_batch(texts: List[str]) -> np.ndarray:
+    """Embed a batch in one request, halving it if the service rejects it as too large."""
+    try:
+        with span("embedding.request") as current:
+            current.items(len(texts))
+            response = await get_limiter(EMBEDDING_DEPLOYMENT).call(
+                lambda: openai.Embedding.acreate(
+                    input=texts,
+                    engine=EMBEDDING_DEPLOYMENT,
+                    api_version="2023-05-15"
+                ),
+                tokens=sum(map(estimate_tokens, texts)))
+            current.tokens(response.get("usage", {}))  # type: ignore
+    except openai.error.InvalidRequestError:
+        if len(texts) == 1:
+            raise
+        logger.warning(
+            f"Embedding batch of {len(texts)} rejected, splitting it in half.")
+        middle = len(texts) // 2
+        return np.vstack([await _embed_batch(texts[:middle]), await _embed_batch(texts[middle:])])
+
+    # Results are not guaranteed to come back in input order
+    data = response['data']  # type: ignore
+    embeddings = np.empty((len(texts), len(data[0]['embedding'])), dtype=np.float32)
+    for item in data:
+        embeddings[item['index']] = item['embedding']
+    return embeddings
+
+
+async def get_embeddings(texts: List[str]) -> np.ndarray:
+    """
+    Embed many texts with as few requests as possible, reusing cached embeddings.
+    Returns one contiguous float32 row per text.
+    """
+    with span("embeddings") as current:
+        current.items(len(texts))
+        embeddings = await asyncio.to_thread(embedding_cache.get_many, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+        current.set("cache_misses", len(missing))
+
+        if missing:
+            batches = list(_iter_embedding_batches(missing))
+            generated = {}
+            results = await asyncio.gather(*map(_embed_batch, batches))
+            for batch, batch_embeddings in zip(batches, results):
+                generated.update(zip(batch, batch_embeddings))
+            logger.info(f"Embeddings generated for {len(missing)} texts in {len(batches)} batches.")
+            await asyncio.to_thread(embedding_cache.put_many, generated)
+            embeddings.update(generated)
+
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack([embeddings[text] for text in texts])
+
+
+async def _generate_group_title(requirements: List[str], use_cache: bool = True) -> str:
     """Generate a title for a group of requirements using GPT-4 and clean it up."""
     prompt = (
         "Create a concise and descriptive title for a group of customer requirements "
@@ -60,7 +242,7 @@ def _generate_group_title(requirements: List[str]) -> str:
     )
 
     # Using GPT-4 model deployed on Azure
-    response = openai.ChatCompletion.create(
+    content, _ = await _chat_completion(
         engine="gpt-4",
         messages=[
             {"role": "system", "content": "You are a helpful assistant."},
@@ -68,12 +250,13 @@ def _generate_group_title(requirements: List[str]) -> str:
         ],
         max_tokens=10,
         temperature=0.7,
-        api_version="2024-08-01-preview"
+        api_version="2024-08-01-preview",
+        use_cache=use_cache,
+        stage="llm.title"
     )
 
     # Clean up the title to ensure it doesn't have any stray quotation marks
-    title = response['choices'][0]['message']['content'].strip().strip(
-        '"').strip("'")  # type: ignore
+    title = content.strip().strip('"').strip("'")
     logger.info(f"Generated title: {title}")
     return title
 
@@ -86,54 +269,52 @@ class FeatureRequestGroup:
     def __repr__(self):
         return f"FeatureRequestGroup(title={self.title}, feature_requests={self.feature_requests})"
 
+    def to_dict(self) -> dict:
+        return {"title": self.title, "feature_requests": list(self.feature_requests)}
+
 
-def process_feature_requests(feature_requests: List[str], distance_threshold: float = 0.6, titles: List[str] = []) -> List[FeatureRequestGroup]:
+async def process_feature_requests(feature_requests: List[str], distance_threshold: float = 0.6,
+                                   topic_matrix: TopicMatrix | None = None,
+                                   similarity_threshold: float = 0.7,
+                                   use_cache: bool = True,
+                                   clusterer: OnlineClusterer | None = None,
+                                   on_event: Callable[[str, dict], None] | None = None
+                                   ) -> List[FeatureRequestGroup]:
     """
     Process a list of requirements, assign them to existing titles based on similarity,
-    and cluster unassigned requirements to generate new titles.
+    and cluster unassigned requirements to generate new titles. A shared `clusterer`
+    carries clusters across calls; without one, a fresh clusterer derived from
+    `distance_threshold` groups just this call's requirements. `on_event` is called
+    with the "assigned" groups before new clusters are titled, then the "clustered" ones.
     """
     logger.info(
         f"Processing {len(feature_requests)} requirements with distance_threshold={distance_threshold}.")
 
     # Generate embeddings for requirements
-    embeddings = []
-    for req in feature_requests:
-        embedding = _get_embedding(req)
-        embeddings.append(embedding)
+    embeddings = await get_embeddings(feature_requests)
     logger.info("All embeddings for requirements generated successfully.")
 
     groups_with_titles = []
     unassigned_requirements = []
     unassigned_embeddings = []
 
-    if titles:
-        # Generate embeddings for titles
-        title_embeddings = []
-        for title in titles:
-            embedding = _get_embedding(title)
-            title_embeddings.append(embedding)
-        title_embeddings = np.array(title_embeddings)
-        logger.info("All embeddings for titles generated successfully.")
-
-        # Initialize groups_with_titles with existing titles
-        groups_with_titles = [FeatureRequestGroup(
-            title, []) for title in titles]
-
-        # For each requirement, compute similarity to each title
-        for idx, (req_embedding, req_text) in enumerate(zip(embeddings, feature_requests)):
-            similarities = cosine_similarity(
-                [req_embedding], title_embeddings)[0]
-            max_similarity = np.max(similarities)
-            max_index = np.argmax(similarities)
-            # Set a similarity threshold
-            similarity_threshold = 0.7
-            if max_similarity >= similarity_threshold:
-                # Assign to the group with max similarity
-                groups_with_titles[max_index].feature_requests.append(req_text)
+    if topic_matrix is not None and len(topic_matrix):
+        # One matrix multiply assigns every requirement to its closest title
+        with span("topic_assign", topics=len(topic_matrix)) as current:
+            current.items(len(feature_requests))
+            assignments = topic_matrix.assign(embeddings, similarity_threshold)
+        groups_by_index = {}
+        for req_text, req_embedding, index in zip(feature_requests, embeddings, assignments):
+            if index >= 0:
+                if index not in groups_by_index:
+                    groups_by_index[index] = FeatureRequestGroup(
+                        topic_matrix.titles[index], [])
+                groups_by_index[index].feature_requests.append(req_text)
             else:
                 # Requirement does not fit any existing title
                 unassigned_requirements.append(req_text)
                 unassigned_embeddings.append(req_embedding)
+        groups_with_titles = list(groups_by_index.values())
         logger.info(
             f"Assigned requirements to existing titles. {len(unassigned_requirements)} requirements unassigned.")
 
@@ -143,38 +324,43 @@ def process_feature_requests(feature_requests: List[str], distance_threshold: fl
         unassigned_embeddings = embeddings
         logger.info(
             "No existing titles provided. All requirements are unassigned.")
+    if on_event:
+        on_event("assigned", {"groups": [group.to_dict() for group in groups_with_titles],
+                              "unassigned": len(unassigned_requirements)})
 
     # Handle unassigned requirements
     if unassigned_requirements:
-        if len(unassigned_embeddings) >= 2:
-            # Perform hierarchical clustering on unassigned requirements
-            cluster = AgglomerativeClustering(
-                n_clusters=None,
-                metric='euclidean',
-                linkage='ward',
-                distance_threshold=distance_threshold
-            )
-            cluster.fit(unassigned_embeddings)
-            labels = cluster.labels_
-            logger.info(
-                "Clustering unassigned requirements completed successfully.")
-
-            # Organize unassigned requirements into groups and generate titles
-            unassigned_groups = defaultdict(list)
-            for label, requirement in zip(labels, unassigned_requirements):
-                unassigned_groups[label].append(requirement)
-
-            for group_reqs in unassigned_groups.values():
-                title = _generate_group_title(group_reqs)
-                groups_with_titles.append(
-                    FeatureRequestGroup(title, group_reqs))
-
-        else:
-            # Only one unassigned requirement, generate a title for it
-            req_text = unassigned_requirements[0]
-            title = _generate_group_title([req_text])
-            groups_with_titles.append(FeatureRequestGroup(title, [req_text]))
+        if clusterer is None:
+            # Unit vectors at euclidean distance d have cosine similarity 1 - d^2 / 2
+            clusterer = OnlineClusterer(threshold=1 - distance_threshold ** 2 / 2)
+        with span("cluster") as current:
+            current.items(len(unassigned_requirements))
+            labels = clusterer.partial_fit(unassigned_embeddings)
+        clustered = defaultdict(list)
+        for label, requirement in zip(labels, unassigned_requirements):
+            clustered[clusterer.find(label)].append(requirement)
+        logger.info(
+            f"Clustered unassigned requirements into {len(clustered)} clusters.")
+
+        # Clusters named by earlier calls keep their title, only new ones need one
+        untitled = [label for label in clustered if clusterer.title(label) is None]
+
+        # Generate the group titles in parallel, paced by the deployment's rate limiter
+        titles = await asyncio.gather(
+            *(_generate_group_title(clustered[label], use_cache) for label in untitled))
+        for label, title in zip(untitled, titles):
+            clusterer.set_title(label, title)
+
+        groups_by_title = {}
+        for label, group_reqs in clustered.items():
+            title = clusterer.title(label)
+            if title not in groups_by_title:
+                groups_by_title[title] = FeatureRequestGroup(title, [])
+                groups_with_titles.append(groups_by_title[title])
+            groups_by_title[title].feature_requests.extend(group_reqs)
         logger.info(
-            f"Generated titles for {len(groups_with_titles)} groups including unassigned requirements.")
+            f"Generated titles for {len(untitled)} new clusters, {len(groups_with_titles)} groups in total.")
+        if on_event:
+            on_event("clustered", {"groups": [group.to_dict() for group in groups_by_title.values()]})
 
     return groups_with_titles
@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_client import session_scope
+from src.db.db_models import Embedding
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store. Keys are a hash of the embedding
+    deployment and the normalized text, so the same text is only ever embedded
+    once per model. Lookups go through an in-process LRU first and fall back to
+    the `embeddings` table in Postgres, which survives restarts.
+    """
+
+    def __init__(self, model: str, maxsize: int = 10000, persistent: bool = True):
+        self.model = model
+        self.persistent = persistent
+        self.memory = LRUCache(maxsize)
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model}\x00{self.normalize(text)}".encode()
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, text: str) -> np.ndarray | None:
+        return self.get_many([text]).get(text)
+
+    def put(self, text: str, embedding: np.ndarray):
+        self.put_many({text: embedding})
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached embeddings for `texts`; missing texts are left out."""
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, List[str]] = {}
+        for text in texts:
+            key = self.key(text)
+            embedding = self.memory.get(key)
+            if embedding is not None:
+                found[text] = embedding
+            else:
+                missing.setdefault(key, []).append(text)
+
+        if missing and self.persistent:
+            for key, embedding in self._load(list(missing)).items():
+                self.memory.put(key, embedding)
+                self.db_hits += 1
+                for text in missing.pop(key):
+                    found[text] = embedding
+
+        self.misses += len(missing)
+        return found
+
+    def put_many(self, embeddings: Dict[str, np.ndarray]):
+        rows = {}
+        for text, embedding in embeddings.items():
+            embedding = np.asarray(embedding, dtype=np.float32)
+            key = self.key(text)
+            self.memory.put(key, embedding)
+            rows[key] = embedding
+        if rows and self.persistent:
+            self._store(rows)
+
+    def get_matrix(self, texts: List[str], chunk_size: int = 5000) -> Tuple[np.ndarray, List[int]]:
+        """
+        Stored embeddings for `texts` as rows of one float32 matrix, read from
+        Postgres in chunks without going through the LRU. Rows of texts with no
+        stored embedding are left at zero and their positions returned.
+        """
+        matrix = None
+        missing = []
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            keys = [self.key(text) for text in chunk]
+            vectors = self._load(list(set(keys)))
+            for offset, key in enumerate(keys):
+                vector = vectors.get(key)
+                if vector is None:
+                    missing.append(start + offset)
+                    continue
+                if matrix is None:
+                    matrix = np.zeros((len(texts), len(vector)), dtype=np.float32)
+                matrix[start + offset] = vector
+        if matrix is None:
+            matrix = np.zeros((len(texts), 0), dtype=np.float32)
+        return matrix, missing
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "memory_size": len(self.memory),
+        }
+
+    def _load(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        try:
+            with session_scope() as session:
+                rows = session.query(Embedding.key, Embedding.vector).filter(
+                    Embedding.key.in_(keys)).all()
+                return {key: np.frombuffer(vector, dtype=np.float32) for key, vector in rows}
+        except (SQLAlchemyError, ValueError) as e:
+            logger.warning("Embedding cache lookup failed, skipping: %s", e)
+            return {}
+
+    def _store(self, rows: Dict[str, np.ndarray]):
+        values = [{
+            "key": key,
+            "model": self.model,
+            "vector": embedding.tobytes()
+        } for key, embedding in rows.items()]
+        try:
+            with session_scope() as session:
+                session.execute(insert(Embedding).values(
+                    values).on_conflict_do_nothing(index_elements=["key"]))
+                session.commit()
+        except (SQLAlchemyError, ValueError) as e:
+            logger.warning("Embedding cache write failed, skipping: %s", e)
+
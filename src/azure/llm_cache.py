@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.azure.embedding_cache import LRUCache
+from src.db.db_client import session_scope
+from src.db.db_models import LLMResponse
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of chat completion outputs keyed on everything that shapes
+    the response: deployment, API version, the prompt messages, temperature and
+    max_tokens. Entries expire after `ttl` and the table is trimmed to the
+    `max_entries` most recent rows every `evict_every` writes.
+    """
+
+    def __init__(self, ttl: timedelta, max_entries: int = 50000, memory_size: int = 1000,
+                 persistent: bool = True, evict_every: int = 100):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self.evict_every = evict_every
+        self.memory = LRUCache(memory_size)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    @staticmethod
+    def key(deployment: str, api_version: str, messages: list, temperature: float,
+            max_tokens: int) -> str:
+        payload = json.dumps([deployment, api_version, messages, temperature, max_tokens],
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = datetime.now(timezone.utc)
+        entry = self.memory.get(key)
+        if entry is not None and entry[1] > now - self.ttl:
+            self.hits += 1
+            return entry[0]
+
+        if self.persistent:
+            row = self._load(key, now - self.ttl)
+            if row is not None:
+                self.memory.put(key, row)
+                self.hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, deployment: str, content: str):
+        now = datetime.now(timezone.utc)
+        self.memory.put(key, (content, now))
+        if not self.persistent:
+            return
+        self._store(key, deployment, content, now)
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        """Delete expired rows and everything beyond the newest `max_entries`."""
+        cutoff = datetime.now(timezone.utc) - self.ttl
+        try:
+            with session_scope() as session:
+                expired = session.query(LLMResponse).filter(
+                    LLMResponse.created_at < cutoff).delete(synchronize_session=False)
+                oldest_kept = session.query(LLMResponse.created_at).order_by(
+                    LLMResponse.created_at.desc()).offset(self.max_entries).limit(1).scalar()
+                overflow = 0
+                if oldest_kept is not None:
+                    overflow = session.query(LLMResponse).filter(
+                        LLMResponse.created_at <= oldest_kept).delete(synchronize_session=False)
+                session.commit()
+                logger.info("LLM cache evicted %d expired and %d overflow entries",
+                            expired, overflow)
+        except (SQLAlchemyError, ValueError) as e:
+            logger.warning("LLM cache eviction failed, skipping: %s", e)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "memory_size": len(self.memory),
+        }
+
+    def _load(self, key: str, not_before: datetime) -> tuple | None:
+        try:
+            with session_scope() as session:
+                row = session.query(LLMResponse).filter(
+                    LLMResponse.key == key, LLMResponse.created_at > not_before).first()
+                return (row.content, row.created_at) if row else None
+        except (SQLAlchemyError, ValueError) as e:
+            logger.warning("LLM cache lookup failed, skipping: %s", e)
+            return None
+
+    def _store(self, key: str, deployment: str, content: str, created_at: datetime):
+        statement = insert(LLMResponse).values(
+            key=key, deployment=deployment, content=content, created_at=created_at)
+        try:
+            with session_scope() as session:
+                session.execute(statement.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={"content": statement.excluded.content,
+                          "created_at": statement.excluded.created_at}))
+                session.commit()
+        except (SQLAlchemyError, ValueError) as e:
+            logger.warning("LLM cache write failed, skipping: %s", e)
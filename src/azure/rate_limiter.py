@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import re
+import time
+
+import openai
+
+from src.retry import backoff
+from src.telemetry.tracing import OPENAI_CONCURRENCY_LIMIT, OPENAI_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Azure's default quotas per deployment; override with OPENAI_RPM_<DEPLOYMENT> and
+# OPENAI_TPM_<DEPLOYMENT>, e.g. OPENAI_TPM_TEXT_EMBEDDING_ADA_002=350000
+DEFAULT_LIMITS = {
+    "gpt-4": (120, 20000),
+    "text-embedding-ada-002": (1440, 240000),
+}
+FALLBACK_LIMITS = (60, 10000)
+
+# Azure enforces quotas over short windows, so only allow bursts of this many seconds of quota
+BURST_SECONDS = 10
+
+OPENAI_CONCURRENCY = int(os.environ.get("OPENAI_CONCURRENCY", "4"))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "32"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "6"))
+
+RETRYABLE_ERRORS = (openai.error.RateLimitError, openai.error.ServiceUnavailableError,
+                    openai.error.Timeout, openai.error.APIConnectionError,
+                    openai.error.TryAgain, openai.error.APIError)
+
+
+class TokenBucket:
+    """
+    Refills `rate` units per second up to `capacity`. A request larger than the
+    capacity waits for a full bucket and leaves it in debt, so the long-run rate
+    still holds.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.available = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float):
+        # Waiters queue on the lock, so requests are admitted in arrival order
+        async with self._lock:
+            self._refill()
+            needed = min(amount, self.capacity)
+            while self.available < needed:
+                await asyncio.sleep((needed - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+
+
+class DeploymentLimiter:
+    """
+    Client-side quota for one Azure OpenAI deployment: request and token buckets
+    sized from its RPM/TPM limits, and an AIMD concurrency limit that grows by one
+    slot per window of successful requests and halves once per throttling event.
+    A throttled request also pauses the whole deployment for the Retry-After the
+    service sent, so queued callers don't pile more 429s on top.
+    """
+
+    def __init__(self, deployment: str, rpm: int, tpm: int, concurrency: int = OPENAI_CONCURRENCY,
+                 max_concurrency: int = OPENAI_MAX_CONCURRENCY, max_retries: int = OPENAI_MAX_RETRIES):
+        self.deployment = deployment
+        self.requests = TokenBucket(max(1.0, rpm * BURST_SECONDS / 60), rpm / 60)
+        self.tokens = TokenBucket(tpm * BURST_SECONDS / 60, tpm / 60)
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self._slot_freed = asyncio.Event()
+        self._paused_until = 0.0
+        # Congestion window, advanced by every decrease
+        self._window = 0
+        OPENAI_CONCURRENCY_LIMIT.labels(deployment).set(self.concurrency)
+
+    async def call(self, request, tokens: int):
+        """
+        Await `request()` within the quota, charging `tokens` against the TPM bucket,
+        and retry throttling and transient failures with jittered exponential backoff.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._take_slot()
+            try:
+                await self._wait_for_quota(tokens)
+                window = self._window
+                response = await request()
+            except RETRYABLE_ERRORS as e:
+                error = e
+            else:
+                self._increase()
+                return response
+            finally:
+                self._release()
+
+            if not self._retryable(error) or attempt == self.max_retries:
+                raise error
+            retry_after = self._retry_after(error)
+            throttled = self._status(error) == 429
+            if throttled:
+                self._decrease(retry_after, window)
+            delay = retry_after or backoff(attempt)
+            OPENAI_RETRIES.labels(self.deployment, "throttled" if throttled else "error").inc()
+            logger.warning("%s request failed (%s), retry %d in %.1fs with concurrency %d",
+                           self.deployment, error, attempt + 1, delay, int(self.concurrency))
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    async def _take_slot(self):
+        while self.in_flight >= int(self.concurrency):
+            await self._slot_freed.wait()
+        self.in_flight += 1
+
+    async def _wait_for_quota(self, tokens: int):
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def _release(self):
+        # Synchronous, so a caller cancelled in its finally block can't leak the slot
+        self.in_flight -= 1
+        self._slot_freed.set()
+        self._slot_freed = asyncio.Event()
+
+    def _increase(self):
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        OPENAI_CONCURRENCY_LIMIT.labels(self.deployment).set(self.concurrency)
+
+    def _decrease(self, retry_after: float | None, window: int):
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        # Requests sent before the last decrease were throttled by the same congestion,
+        # so a burst of 429s halves the limit once rather than once per request
+        if window != self._window:
+            return
+        self._window += 1
+        self.concurrency = max(1.0, self.concurrency / 2)
+        OPENAI_CONCURRENCY_LIMIT.labels(self.deployment).set(self.concurrency)
+
+    @staticmethod
+    def _status(error: openai.error.OpenAIError) -> int | None:
+        if isinstance(error, openai.error.RateLimitError):
+            return 429
+        return error.http_status
+
+    @classmethod
+    def _retryable(cls, error: openai.error.OpenAIError) -> bool:
+        if isinstance(error, openai.error.APIError):
+            # The client raises APIError for any unexpected status; only 5xx are worth retrying
+            return (error.http_status or 500) >= 500
+        return True
+
+    @staticmethod
+    def _retry_after(error: openai.error.OpenAIError) -> float | None:
+        headers = error.headers or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            return float(headers["Retry-After"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+_limiters: dict = {}
+
+
+def get_limiter(deployment: str) -> DeploymentLimiter:
+    """The shared limiter for a deployment, created from its environment limits on first use."""
+    if deployment not in _limiters:
+        name = re.sub(r"\W", "_", deployment).upper()
+        rpm, tpm = DEFAULT_LIMITS.get(deployment, FALLBACK_LIMITS)
+        _limiters[deployment] = DeploymentLimiter(
+            deployment,
+            rpm=int(os.environ.get(f"OPENAI_RPM_{name}", rpm)),
+            tpm=int(os.environ.get(f"OPENAI_TPM_{name}", tpm)))
+    return _limiters[deployment]
@@ -0,0 +1,68 @@
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from src.db.db_models import Customer
+
+logger = logging.getLogger(__name__)
+
+
+class CustomerCache:
+    """
+    Case-folded, in-memory copy of the customers table. The whole table is read
+    in one query and refreshed after `ttl` seconds or whenever a session flushes
+    a change to a Customer, so filtering calls is a dict lookup per call.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._customers: dict[str, Customer] = {}
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def lookup(self, db: Session, name: str) -> Customer | None:
+        """Return the customer matching `name` case-insensitively, or None."""
+        if not self.ttl:
+            return self._query(db, name)
+        try:
+            customers = self._get_customers(db)
+        except SQLAlchemyError as e:
+            logger.warning("Could not refresh customer cache, querying directly: %s", e)
+            return self._query(db, name)
+        return customers.get(name.casefold())
+
+    def _get_customers(self, db: Session) -> dict[str, Customer]:
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                customers = {}
+                for customer in db.query(Customer).all():
+                    customers[customer.name.casefold()] = customer
+                    db.expunge(customer)
+                self._customers = customers
+                self._loaded_at = time.monotonic()
+                logger.info("Customer cache loaded with %d customers", len(customers))
+            return self._customers
+
+    @staticmethod
+    def _query(db: Session, name: str) -> Customer | None:
+        # Served by the functional index on lower(name)
+        return db.query(Customer).filter(
+            func.lower(Customer.name) == name.lower()).first()
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_customer_write(session: Session, flush_context):
+    changed = session.new | session.dirty | session.deleted
+    if any(isinstance(instance, Customer) for instance in changed):
+        customer_cache.invalidate()
+
+
+customer_cache = CustomerCache(ttl=float(os.getenv('CUSTOMER_CACHE_TTL', '300')))
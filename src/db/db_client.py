@@ -1,8 +1,13 @@
-from typing import Any, Generator
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncGenerator, Generator, Iterator
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
 
 # ...existing code...
@@ -10,31 +15,134 @@ import os
 Base = declarative_base()
 
 
+class _PoolWaitMixin:
+    """Records how long callers wait to check a connection out of the pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = {"checkouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+        self._wait_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore
+        finally:
+            waited = time.perf_counter() - start
+            with self._wait_lock:
+                self.wait_stats["checkouts"] += 1
+                self.wait_stats["wait_seconds_total"] += waited
+                self.wait_stats["wait_seconds_max"] = max(
+                    self.wait_stats["wait_seconds_max"], waited)
+
+    def recreate(self):
+        pool = super().recreate()  # type: ignore
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+class TimedQueuePool(_PoolWaitMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_PoolWaitMixin, AsyncAdaptedQueuePool):
+    pass
+
+
 class DatabaseEngine:
     _engine = None
+    _async_engine = None
+
+    @staticmethod
+    def _url(driver: str) -> str:
+        user = os.getenv('DB_USER')
+        password = os.getenv('DB_PASSWORD')
+        host = os.getenv('DB_HOST')
+        port = os.getenv('DB_PORT')
+        dbname = os.getenv('DB_NAME')
+
+        if not all([user, password, host, port, dbname]):
+            raise ValueError(
+                "Database connection parameters must be provided through environment variables.")
+        return f"{driver}://{user}:{password}@{host}:{port}/{dbname}"
+
+    @staticmethod
+    def _pool_options() -> dict:
+        return {
+            "pool_size": int(os.getenv('DB_POOL_SIZE', '5')),
+            "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            "pool_timeout": float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', '1800')),
+            "pool_pre_ping": os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        }
+
+    @staticmethod
+    def _statement_timeout() -> str:
+        return os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000')
 
     @classmethod
     def get_postgres_engine(cls):
         if cls._engine is None:
-            user = os.getenv('DB_USER')
-            password = os.getenv('DB_PASSWORD')
-            host = os.getenv('DB_HOST')
-            port = os.getenv('DB_PORT')
-            dbname = os.getenv('DB_NAME')
-
-            if not all([user, password, host, port, dbname]):
-                raise ValueError(
-                    "Database connection parameters must be provided through environment variables.")
-            url = f"postgresql://{user}:{password}@{host}:{port}/{dbname}"
-            cls._engine = create_engine(url)
+            cls._engine = create_engine(
+                cls._url("postgresql"),
+                poolclass=TimedQueuePool,
+                connect_args={"options": f"-c statement_timeout={cls._statement_timeout()}"},
+                **cls._pool_options())
+            SessionLocal.configure(bind=cls._engine)
         return cls._engine
 
+    @classmethod
+    def get_async_postgres_engine(cls):
+        if cls._async_engine is None:
+            cls._async_engine = create_async_engine(
+                cls._url("postgresql+asyncpg"),
+                poolclass=TimedAsyncAdaptedQueuePool,
+                connect_args={"server_settings": {"statement_timeout": cls._statement_timeout()}},
+                **cls._pool_options())
+            AsyncSessionLocal.configure(bind=cls._async_engine)
+        return cls._async_engine
+
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
 
 def get_session() -> Generator[Session, Any, Any]:
-    engine = DatabaseEngine.get_postgres_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    DatabaseEngine.get_postgres_engine()
     session = SessionLocal()
     try:
         yield session
     finally:
         session.close()
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, Any]:
+    DatabaseEngine.get_async_postgres_engine()
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """Session for work that runs outside a request, such as background jobs."""
+    yield from get_session()
+
+
+def get_pool_stats() -> dict:
+    """Connection pool usage for every engine created so far."""
+    stats = {}
+    engines = {"sync": DatabaseEngine._engine}
+    if DatabaseEngine._async_engine is not None:
+        engines["async"] = DatabaseEngine._async_engine.sync_engine
+    for name, engine in engines.items():
+        if engine is None:
+            continue
+        pool = engine.pool
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            **getattr(pool, "wait_stats", {}),
+        }
+    return stats
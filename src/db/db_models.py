@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import (BigInteger, Column, Integer, String, ForeignKey, DateTime, LargeBinary, Index, Text,
+                        func, literal_column)
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -11,17 +12,108 @@ class Customer(Base):
     score = Column(Integer, nullable=False)
 
 
+# Case-insensitive customer name lookups
+Index('ix_customers_lower_name', func.lower(Customer.name))
+
+
 class Topic(Base):
     __tablename__ = 'topics'
 
     title = Column(String(255), primary_key=True)
+    # float32 title embedding, see src/topics/topic_matrix.py
+    embedding = Column(LargeBinary, nullable=True)
 
 
 class FeatureRequest(Base):
     __tablename__ = 'feature_requests'
 
-    title = Column(String(255), ForeignKey('topics.title'))
-    customer_name = Column(String(255), ForeignKey('customers.name'))
-    description = Column(String(1000), primary_key=True)
+    id = Column(BigInteger, primary_key=True)
+    title = Column(String(255), ForeignKey('topics.title'), index=True)
+    customer_name = Column(String(255), ForeignKey('customers.name'), index=True)
+    description = Column(String(1000), nullable=False)
     time = Column(DateTime, nullable=False)
+    # Earlier request this one nearly duplicates, NULL for canonical requests
+    canonical_description = Column(String(1000), nullable=True, index=True)
+
+
+# One row per customer and wording; the same words from another customer are a
+# separate request, linked to the first one as a duplicate
+FEATURE_REQUEST_KEY = (FeatureRequest.description,
+                       func.coalesce(FeatureRequest.customer_name, literal_column("''")))
+Index('ux_feature_requests_description_customer', *FEATURE_REQUEST_KEY, unique=True)
+
+
+class Embedding(Base):
+    __tablename__ = 'embeddings'
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String(255), nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+
+
+class LLMResponse(Base):
+    __tablename__ = 'llm_responses'
+
+    key = Column(String(64), primary_key=True)
+    deployment = Column(String(255), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class GongCall(Base):
+    __tablename__ = 'gong_calls'
+
+    call_id = Column(String(64), primary_key=True)
+    # zlib-compressed JSON of the raw Gong call and transcript objects
+    call_data = Column(LargeBinary, nullable=True)
+    transcript = Column(LargeBinary, nullable=True)
+    call_fetched_at = Column(DateTime(timezone=True), nullable=True)
+    transcript_fetched_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class Call(Base):
+    __tablename__ = 'calls'
 
+    id = Column(String(64), primary_key=True)
+    title = Column(String(512))
+    started = Column(DateTime(timezone=True), nullable=False, index=True)
+    customer_name = Column(String(255), index=True)
+    synced_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class SyncState(Base):
+    __tablename__ = 'sync_state'
+
+    name = Column(String(64), primary_key=True)
+    # Start time of the newest call synced so far
+    watermark = Column(DateTime(timezone=True), nullable=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class TopicStats(Base):
+    """Leaderboard row per topic, kept current by src/db/topic_stats.py."""
+    __tablename__ = 'topic_stats'
+
+    title = Column(String(255), primary_key=True)
+    # Sum of the scores of the distinct customers asking for the topic, each counted once
+    score = Column(Integer, nullable=False)
+    # Canonical requests only; near-duplicates don't add to the count
+    requests = Column(Integer, nullable=False)
+    customers = Column(Integer, nullable=False)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+
+
+Index('ix_topic_stats_rank', TopicStats.score.desc(), TopicStats.title)
+
+
+class TopicRollup(Base):
+    """The same aggregates per topic and week or month, for trend views."""
+    __tablename__ = 'topic_rollups'
+
+    period = Column(String(8), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    title = Column(String(255), primary_key=True, index=True)
+    score = Column(Integer, nullable=False)
+    requests = Column(Integer, nullable=False)
+    customers = Column(Integer, nullable=False)
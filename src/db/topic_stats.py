@@ -0,0 +1,141 @@
+import argparse
+import logging
+from typing import Iterable
+
+from sqlalchemy import Connection, delete, distinct, event, exists, func, literal, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, attributes
+
+from src.db.db_client import session_scope
+from src.db.db_models import Customer, FeatureRequest, TopicRollup, TopicStats
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("week", "month")
+
+
+def refresh_topics(connection: Connection, titles: Iterable[str] | None = None):
+    """
+    Recompute the leaderboard row and rollups of the given topics from their
+    feature requests, or of every topic when `titles` is None. Refreshing only
+    the topics a write touched keeps the cost proportional to those topics, and
+    a per-topic advisory lock held until commit stops two concurrent refreshes
+    of the same topic from racing. Runs in the caller's transaction.
+    """
+    title_filter = []
+    if titles is not None:
+        titles = sorted({title for title in titles if title})
+        if not titles:
+            return
+        connection.execute(text(
+            "SELECT pg_advisory_xact_lock(hashtext(title)) "
+            "FROM (SELECT unnest(CAST(:titles AS text[])) AS title ORDER BY 1) AS locked"),
+            {"titles": titles})
+        title_filter = [FeatureRequest.title.in_(titles)]
+    else:
+        # Writers refreshing single topics wait for a full rebuild instead of racing it
+        connection.execute(text("LOCK TABLE topic_stats, topic_rollups IN EXCLUSIVE MODE"))
+
+    per_customer = _per_customer(title_filter).subquery()
+    connection.execute(delete(TopicStats).where(
+        *([TopicStats.title.in_(titles)] if title_filter else [])))
+    connection.execute(insert(TopicStats).from_select(
+        ["title", "score", "requests", "customers", "first_seen", "last_seen"],
+        select(per_customer.c.title, *_aggregates(per_customer),
+               func.min(per_customer.c.first_seen), func.max(per_customer.c.last_seen))
+        .outerjoin(Customer, Customer.name == per_customer.c.customer_name)
+        .group_by(per_customer.c.title)))
+
+    connection.execute(delete(TopicRollup).where(
+        *([TopicRollup.title.in_(titles)] if title_filter else [])))
+    for period in PERIODS:
+        # Inlined so SELECT and GROUP BY share one expression when parameters bind server-side
+        bucket = func.date_trunc(literal_column(f"'{period}'"), FeatureRequest.time).label("bucket")
+        per_customer = _per_customer(title_filter, bucket).subquery()
+        connection.execute(insert(TopicRollup).from_select(
+            ["period", "bucket", "title", "score", "requests", "customers"],
+            select(literal(period), per_customer.c.bucket, per_customer.c.title,
+                   *_aggregates(per_customer))
+            .outerjoin(Customer, Customer.name == per_customer.c.customer_name)
+            .group_by(per_customer.c.bucket, per_customer.c.title)))
+
+
+def _per_customer(title_filter: list, *group_by):
+    """
+    One row per topic and customer (and bucket), so a customer asking for the
+    same thing many times, or in many words, weighs the topic once. Near-duplicate
+    requests are not counted as requests of their own.
+    """
+    return select(
+        FeatureRequest.title,
+        FeatureRequest.customer_name,
+        *group_by,
+        func.count().filter(FeatureRequest.canonical_description.is_(None)).label("requests"),
+        func.min(FeatureRequest.time).label("first_seen"),
+        func.max(FeatureRequest.time).label("last_seen"),
+    ).where(FeatureRequest.title.is_not(None), *title_filter).group_by(
+        FeatureRequest.title, FeatureRequest.customer_name, *group_by)
+
+
+def _aggregates(per_customer) -> list:
+    return [
+        func.sum(func.coalesce(Customer.score, 0)),
+        func.sum(per_customer.c.requests),
+        func.count(per_customer.c.customer_name),
+    ]
+
+
+def refresh_customers(connection: Connection, names: Iterable[str]):
+    """Refresh every topic the given customers have feature requests in."""
+    names = list(set(names))
+    if not names:
+        return
+    titles = connection.execute(
+        select(distinct(FeatureRequest.title)).where(FeatureRequest.customer_name.in_(names))
+    ).scalars().all()
+    refresh_topics(connection, titles)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_on_customer_score_change(session: Session, flush_context):
+    # A customer's score weighs every topic it has requests in
+    names = {instance.name for instance in session.new | session.deleted
+             if isinstance(instance, Customer)}
+    names.update(instance.name for instance in session.dirty
+                 if isinstance(instance, Customer)
+                 and attributes.get_history(instance, "score").has_changes())
+    if names:
+        refresh_customers(session.connection(), names)
+
+
+def rebuild_if_empty() -> bool:
+    """
+    Build the leaderboard of a database whose feature requests predate it, so
+    rankings don't read an empty topic_stats. A no-op once it has rows.
+    """
+    with session_scope() as db:
+        connection = db.connection()
+        if connection.execute(select(exists().select_from(TopicStats))).scalar() or \
+                not connection.execute(select(exists().where(FeatureRequest.title.is_not(None)))).scalar():
+            return False
+        logger.info("Topic leaderboard is empty, rebuilding it from stored feature requests")
+        refresh_topics(connection)
+        db.commit()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the topic leaderboard and rollups, e.g. after editing tables with SQL.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with session_scope() as db:
+        refresh_topics(db.connection())
+        db.commit()
+        print(f"Rebuilt stats for {db.query(TopicStats).count()} topics")
+
+
+if __name__ == "__main__":
+    main()
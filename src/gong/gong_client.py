@@ -1,87 +1,157 @@
+import asyncio
 import base64
 import logging
+from typing import AsyncIterator
 
-import requests
+import httpx
 
+from src.retry import backoff
 from src.schemas.schemas import CallResponse
+from src.telemetry.tracing import span
 
 
 logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
 class GongClient:
 
-    def __init__(self, username: str, password: str):
-        self.base_url = 'https://api.gong.io/v2'
+    def __init__(self, username: str, password: str, base_url: str = 'https://api.gong.io/v2',
+                 max_connections: int = 10, concurrency: int = 3, max_retries: int = 5,
+                 timeout: float = 30):
+        self.base_url = base_url
         self.headers = {
-            'Authorization': f'Basic {self.generate_auth_token(username, password)}'
+            'Authorization': f'Basic {self.generate_auth_token(username, password)}',
+            'Content-Type': 'application/json'
         }
+        self.max_retries = max_retries
+        # One keep-alive pool shared by every request this client makes
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections))
+        # Gong rate limits per API key, so cap in-flight requests
+        self._semaphore = asyncio.Semaphore(concurrency)
 
     @staticmethod
     def generate_auth_token(username: str, password: str) -> str:
         token = base64.b64encode(f'{username}:{password}'.encode()).decode()
         return token
 
-    def get_transcription(self, call_ids: list):
+    async def close(self):
+        await self.client.aclose()
+
+    async def _post(self, path: str, data: dict) -> dict:
+        """POST to Gong, retrying 429s and transient errors with backoff that honors Retry-After."""
+        with span('gong.request', path=path) as current:
+            return await self._post_with_retries(path, data, current)
+
+    async def _post_with_retries(self, path: str, data: dict, current) -> dict:
+        url = f'{self.base_url}{path}'
+        for attempt in range(self.max_retries + 1):
+            current.set('attempts', attempt + 1)
+            try:
+                async with self._semaphore:
+                    response = await self.client.post(url, json=data)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff(attempt)
+                logger.warning('Gong request to %s failed (%s), retrying in %.1fs', path, e, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                logger.error(
+                    'Error while calling gong %s %s - %s', path, response.status_code, response.text)
+                response.raise_for_status()
+
+            delay = self._retry_after(response) or backoff(attempt)
+            logger.warning('Gong returned %s for %s, retrying in %.1fs',
+                           response.status_code, path, delay)
+            await asyncio.sleep(delay)
+        raise RuntimeError('unreachable')
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float | None:
+        try:
+            return float(response.headers['Retry-After'])
+        except (KeyError, ValueError):
+            return None
+
+    async def _paginate(self, path: str, data: dict) -> AsyncIterator[dict]:
+        """Yield every page of a Gong list endpoint, following the records cursor."""
+        cursor = None
+        while True:
+            page = await self._post(path, {**data, 'cursor': cursor} if cursor else data)
+            yield page
+            cursor = page.get('records', {}).get('cursor')
+            if not cursor:
+                break
+
+    async def get_transcription(self, call_ids: list):
         logger.info('Getting gong transcription for call_id %s', call_ids)
-        url = f'{self.base_url}/calls/transcript'
-        headers = self.headers.copy()
-        headers['Content-Type'] = 'application/json'
         data = {
             "filter": {
                 "callIds": call_ids
             }
         }
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.error(
-                'Error while getting gong calls %s - %s', response.status_code, response.text)
-            response.raise_for_status()
-
-    def get_extensive_calls(self, call_id: str | None = None):
-        logger.info('Getting gong extensive calls for call_id %s', call_id)
-        url = f'{self.base_url}/calls/extensive'
-        headers = self.headers.copy()
-        headers['Content-Type'] = 'application/json'
-        if call_id:
-            data = {
-                "contentSelector": {
-                    "context": "Extended"
-                },
-                "filter": {
-                    "callIds": [call_id]
-                }
-            }
-        else:
-            data = {
-                "contentSelector": {
-                    "context": "Extended"
-                },
-                "filter": {
-                    "fromDateTime": "2024-11-01T23:59:00-08:00",
-                    "toDateTime": "2024-12-01T23:59:00-08:00",
-                }
-            }
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-
-        if response.status_code == 200:
-            gong_response = response.json()
-            transformed_response: list[CallResponse] = []
-            for call in gong_response.get('calls', []):
-                customer_name = None
-                for field in call.get('context', [])[0].get('objects', [])[0].get('fields', []):
-                    if field.get('name') == 'Name':
-                        customer_name = field.get('value')
-                        break
-                transformed_response.append(CallResponse(
-                    id=call.get('metaData', {}).get('id'),
-                    title=call.get('metaData', {}).get('title'),
-                    started=call.get('metaData', {}).get('started'),
-                    customer_name=customer_name  # type: ignore
-                ))
-            return transformed_response
-        else:
-            logger.error(
-                'Error while getting extensive calls %s - %s', response.status_code, response.text)
-            response.raise_for_status()
+        with span('gong.get_transcription') as current:
+            transcripts = []
+            async for page in self._paginate('/calls/transcript', data):
+                transcripts.extend(page.get('callTranscripts', []))
+            current.items(len(transcripts))
+        return {"callTranscripts": transcripts}
+
+    async def iter_extensive_calls(self, call_ids: list | None = None, from_date: str | None = None,
+                                   to_date: str | None = None) -> AsyncIterator[CallResponse]:
+        """Stream calls page by page, by ID or by date range."""
+        async for call in self.iter_raw_calls(call_ids, from_date, to_date):
+            yield self.to_call_response(call)
+
+    async def iter_raw_calls(self, call_ids: list | None = None, from_date: str | None = None,
+                             to_date: str | None = None) -> AsyncIterator[dict]:
+        """Stream the unparsed Gong call objects behind `iter_extensive_calls`."""
+        call_filter = {}
+        if call_ids:
+            call_filter["callIds"] = call_ids
+        if from_date:
+            call_filter["fromDateTime"] = from_date
+        if to_date:
+            call_filter["toDateTime"] = to_date
+        data = {
+            "contentSelector": {
+                "context": "Extended"
+            },
+            "filter": call_filter
+        }
+        async for page in self._paginate('/calls/extensive', data):
+            for call in page.get('calls', []):
+                yield call
+
+    async def get_extensive_calls(self, call_id: str | None = None, call_ids: list | None = None,
+                                  from_date: str | None = None, to_date: str | None = None):
+        logger.info('Getting gong extensive calls for call_id %s', call_id or call_ids)
+        with span('gong.get_extensive_calls') as current:
+            calls = [call async for call in self.iter_extensive_calls(
+                call_ids or ([call_id] if call_id else None), from_date, to_date)]
+            current.items(len(calls))
+        return calls
+
+    @staticmethod
+    def to_call_response(call: dict) -> CallResponse:
+        fields = (field for context in call.get('context', [])
+                  for gong_object in context.get('objects', [])
+                  for field in gong_object.get('fields', []))
+        customer_name = next(
+            (field.get('value') for field in fields if field.get('name') == 'Name'), None)
+        return CallResponse(
+            id=call.get('metaData', {}).get('id'),
+            title=call.get('metaData', {}).get('title'),
+            started=call.get('metaData', {}).get('started'),
+            customer_name=customer_name  # type: ignore
+        )
@@ -0,0 +1,95 @@
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:  # pragma: no cover - tiktoken is optional
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for GPT-4 / ada-002; estimated at four characters per token without tiktoken."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return estimate_tokens(text)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate of roughly four characters per token for English text with cl100k_base."""
+    return len(text) // 4 + 1
+
+
+def flatten_transcript(call_transcripts: list) -> List[str]:
+    """
+    Turn Gong's callTranscripts payload into one line per speaker turn, e.g.
+    "S1: text". Timestamps and raw speaker IDs are dropped and consecutive
+    monologues by the same speaker are merged.
+    """
+    speakers: dict = {}
+    lines: List[str] = []
+    last_speaker = None
+    for call in call_transcripts:
+        for monologue in call.get("transcript", []):
+            speaker_id = monologue.get("speakerId")
+            speaker = speakers.setdefault(speaker_id, f"S{len(speakers) + 1}")
+            text = " ".join(sentence.get("text", "").strip()
+                            for sentence in monologue.get("sentences", [])).strip()
+            if not text:
+                continue
+            if speaker == last_speaker:
+                lines[-1] = f"{lines[-1]} {text}"
+            else:
+                lines.append(f"{speaker}: {text}")
+            last_speaker = speaker
+    return lines
+
+
+def chunk_lines(lines: List[str], max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Pack transcript lines into chunks of at most `max_tokens`. Each chunk
+    repeats up to `overlap_tokens` of the previous chunk's trailing lines so a
+    request that spans a boundary is seen whole at least once.
+    """
+    chunks: List[str] = []
+    current: List[tuple] = []
+    current_tokens = 0
+    for line in _split_long_lines(lines, max_tokens):
+        tokens = count_tokens(line)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(text for text, _ in current))
+            # Carry the tail of this chunk into the next one
+            carried: List[tuple] = []
+            carried_tokens = 0
+            for text, text_tokens in reversed(current):
+                if carried_tokens + text_tokens > overlap_tokens \
+                        or carried_tokens + text_tokens + tokens > max_tokens:
+                    break
+                carried.insert(0, (text, text_tokens))
+                carried_tokens += text_tokens
+            current, current_tokens = carried, carried_tokens
+        current.append((line, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(text for text, _ in current))
+    return chunks
+
+
+def _split_long_lines(lines: List[str], max_tokens: int):
+    for line in lines:
+        if count_tokens(line) <= max_tokens:
+            yield line
+            continue
+        piece: List[str] = []
+        piece_tokens = 0
+        for word in line.split():
+            word_tokens = count_tokens(f" {word}")
+            if piece and piece_tokens + word_tokens > max_tokens:
+                yield " ".join(piece)
+                piece, piece_tokens = [], 0
+            piece.append(word)
+            piece_tokens += word_tokens
+        if piece:
+            yield " ".join(piece)
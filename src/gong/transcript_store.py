@@ -0,0 +1,280 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.db_client import session_scope
+from src.db.db_models import GongCall
+from src.gong.gong_client import GongClient
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptStore(ABC):
+    """
+    Local copy of Gong call objects and transcripts keyed by call ID. `kind` is
+    "call" for the raw `/calls/extensive` object or "transcript" for the
+    `/calls/transcript` entry. `load` returns {call_id: (payload, fetched_at)}.
+    """
+
+    @abstractmethod
+    def load(self, kind: str, call_ids: List[str]) -> Dict[str, tuple]:
+        ...
+
+    @abstractmethod
+    def load_all(self, kind: str) -> Dict[str, tuple]:
+        ...
+
+    @abstractmethod
+    def save(self, kind: str, payloads: Dict[str, dict]):
+        ...
+
+
+class PostgresTranscriptStore(TranscriptStore):
+    """Keeps payloads as zlib-compressed JSON in the `gong_calls` table."""
+
+    columns = {
+        "call": (GongCall.call_data, GongCall.call_fetched_at),
+        "transcript": (GongCall.transcript, GongCall.transcript_fetched_at),
+    }
+
+    def load(self, kind: str, call_ids: List[str]) -> Dict[str, tuple]:
+        if not call_ids:
+            return {}
+        return self._query(kind, GongCall.call_id.in_(call_ids))
+
+    def load_all(self, kind: str) -> Dict[str, tuple]:
+        return self._query(kind)
+
+    def _query(self, kind: str, *clauses) -> Dict[str, tuple]:
+        data, fetched_at = self.columns[kind]
+        try:
+            with session_scope() as session:
+                rows = session.query(GongCall.call_id, data, fetched_at).filter(
+                    data.isnot(None), *clauses).all()
+        except (SQLAlchemyError, ValueError) as e:
+            logger.warning("Transcript store lookup failed, skipping: %s", e)
+            return {}
+        return {call_id: (json.loads(zlib.decompress(blob)), fetched)
+                for call_id, blob, fetched in rows}
+
+    def save(self, kind: str, payloads: Dict[str, dict]):
+        if not payloads:
+            return
+        data, fetched_at = self.columns[kind]
+        now = datetime.now(timezone.utc)
+        statement = insert(GongCall).values([
+            {"call_id": call_id, data.key: zlib.compress(json.dumps(payload).encode()),
+             fetched_at.key: now}
+            for call_id, payload in payloads.items()])
+        try:
+            with session_scope() as session:
+                session.execute(statement.on_conflict_do_update(
+                    index_elements=["call_id"],
+                    set_={data.key: statement.excluded[data.key],
+                          fetched_at.key: statement.excluded[fetched_at.key]}))
+                session.commit()
+        except (SQLAlchemyError, ValueError) as e:
+            logger.warning("Transcript store write failed, skipping: %s", e)
+
+
+class FileTranscriptStore(TranscriptStore):
+    """
+    Keeps one gzipped JSON file per call under `<path>/<kind>/<call_id>.json.gz`.
+    A directory of recorded calls doubles as the fixture set for offline runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def _file(self, kind: str, call_id: str) -> Path:
+        return self.path / kind / f"{call_id}.json.gz"
+
+    def load(self, kind: str, call_ids: List[str]) -> Dict[str, tuple]:
+        found = {}
+        for call_id in call_ids:
+            entry = self._read(self._file(kind, call_id))
+            if entry is not None:
+                found[call_id] = entry
+        return found
+
+    def load_all(self, kind: str) -> Dict[str, tuple]:
+        found = {}
+        for file in (self.path / kind).glob("*.json.gz"):
+            entry = self._read(file)
+            if entry is not None:
+                found[file.name[:-len(".json.gz")]] = entry
+        return found
+
+    def save(self, kind: str, payloads: Dict[str, dict]):
+        now = datetime.now(timezone.utc).isoformat()
+        (self.path / kind).mkdir(parents=True, exist_ok=True)
+        for call_id, payload in payloads.items():
+            file = self._file(kind, call_id)
+            tmp = file.with_suffix(".tmp")
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump({"fetched_at": now, "payload": payload}, f)
+            tmp.replace(file)
+
+    @staticmethod
+    def _read(file: Path) -> tuple | None:
+        try:
+            with gzip.open(file, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Skipping unreadable transcript file %s: %s", file, e)
+            return None
+        return entry["payload"], datetime.fromisoformat(entry["fetched_at"])
+
+
+class StoredGongClient:
+    """
+    Drop-in for GongClient that serves calls and transcripts from a
+    TranscriptStore and only asks Gong for IDs that are missing or older than
+    the kind's max age (None keeps entries forever). Date-range listings always
+    go to Gong, since new calls may have happened, and refresh the stored
+    metadata on the way. With `offline=True`, or without a Gong client, nothing
+    is fetched and only stored calls are served.
+    """
+
+    def __init__(self, gong_client: GongClient | None, store: TranscriptStore,
+                 transcript_max_age: timedelta | None = None,
+                 call_max_age: timedelta | None = timedelta(hours=24),
+                 offline: bool = False):
+        self.gong_client = gong_client
+        self.store = store
+        self.max_age = {"transcript": transcript_max_age, "call": call_max_age}
+        self.offline = offline or gong_client is None
+
+    async def close(self):
+        if self.gong_client is not None:
+            await self.gong_client.close()
+
+    async def _load_fresh(self, kind: str, call_ids: List[str]) -> Dict[str, dict]:
+        entries = await asyncio.to_thread(self.store.load, kind, call_ids)
+        max_age = self.max_age[kind]
+        if self.offline or max_age is None:
+            return {call_id: payload for call_id, (payload, _) in entries.items()}
+        cutoff = datetime.now(timezone.utc) - max_age
+        return {call_id: payload for call_id, (payload, fetched_at) in entries.items()
+                if _aware(fetched_at) > cutoff}
+
+    async def get_transcription(self, call_ids: list):
+        call_ids = list(dict.fromkeys(call_ids))
+        transcripts = await self._load_fresh("transcript", call_ids)
+        missing = [call_id for call_id in call_ids if call_id not in transcripts]
+        logger.info("Transcript store served %d of %d transcripts",
+                    len(call_ids) - len(missing), len(call_ids))
+        if missing and not self.offline:
+            fetched = await self.gong_client.get_transcription(missing)  # type: ignore
+            fetched = {transcript.get("callId"): transcript
+                       for transcript in fetched.get("callTranscripts", [])}
+            await asyncio.to_thread(self.store.save, "transcript", fetched)
+            transcripts.update(fetched)
+        return {"callTranscripts": [transcripts[call_id] for call_id in call_ids
+                                    if call_id in transcripts]}
+
+    async def get_extensive_calls(self, call_id: str | None = None, call_ids: list | None = None,
+                                  from_date: str | None = None, to_date: str | None = None):
+        call_ids = call_ids or ([call_id] if call_id else None)
+        if call_ids:
+            calls = await self._get_calls_by_id(list(dict.fromkeys(call_ids)))
+        elif self.offline:
+            calls = await self._get_stored_calls_in_range(from_date, to_date)
+        else:
+            calls = [call async for call in self.gong_client.iter_raw_calls(  # type: ignore
+                None, from_date, to_date)]
+            await asyncio.to_thread(self.store.save, "call", {
+                call.get("metaData", {}).get("id"): call for call in calls})
+        return [GongClient.to_call_response(call) for call in calls]
+
+    async def iter_extensive_calls(self, call_ids: list | None = None, from_date: str | None = None,
+                                   to_date: str | None = None, batch_size: int = 100):
+        """Stream calls from Gong page by page, storing them in batches as they arrive."""
+        if call_ids or self.offline:
+            for call in await self.get_extensive_calls(
+                    call_ids=call_ids, from_date=from_date, to_date=to_date):
+                yield call
+            return
+
+        batch = {}
+        async for call in self.gong_client.iter_raw_calls(None, from_date, to_date):  # type: ignore
+            batch[call.get("metaData", {}).get("id")] = call
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(self.store.save, "call", batch)
+                batch = {}
+            yield GongClient.to_call_response(call)
+        await asyncio.to_thread(self.store.save, "call", batch)
+
+    async def _get_calls_by_id(self, call_ids: List[str]) -> List[dict]:
+        calls = await self._load_fresh("call", call_ids)
+        missing = [call_id for call_id in call_ids if call_id not in calls]
+        if missing and not self.offline:
+            fetched = {call.get("metaData", {}).get("id"): call
+                       async for call in self.gong_client.iter_raw_calls(missing)}  # type: ignore
+            await asyncio.to_thread(self.store.save, "call", fetched)
+            calls.update(fetched)
+        return [calls[call_id] for call_id in call_ids if call_id in calls]
+
+    async def _get_stored_calls_in_range(self, from_date: str | None,
+                                         to_date: str | None) -> List[dict]:
+        entries = await asyncio.to_thread(self.store.load_all, "call")
+        start = _aware(datetime.fromisoformat(from_date)) if from_date else None
+        end = _aware(datetime.fromisoformat(to_date)) if to_date else None
+        calls = []
+        for call, _ in entries.values():
+            started = call.get("metaData", {}).get("started")
+            if started:
+                started = _aware(datetime.fromisoformat(started))
+                if (start and started < start) or (end and started > end):
+                    continue
+            calls.append(call)
+        return sorted(calls, key=lambda call: call.get("metaData", {}).get("started") or "")
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _hours(name: str, default: str) -> timedelta | None:
+    hours = float(os.getenv(name, default))
+    return timedelta(hours=hours) if hours > 0 else None
+
+
+def create_transcript_store(kind: str | None = None) -> TranscriptStore | None:
+    """Store selected by TRANSCRIPT_STORE: postgres (default), file or none."""
+    kind = kind or os.getenv("TRANSCRIPT_STORE", "postgres")
+    if kind == "postgres":
+        return PostgresTranscriptStore()
+    if kind == "file":
+        return FileTranscriptStore(os.getenv("TRANSCRIPT_STORE_PATH", "data/transcripts"))
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown TRANSCRIPT_STORE {kind!r}, expected postgres, file or none")
+
+
+def create_stored_gong_client(gong_client: GongClient):
+    """
+    Wrap `gong_client` with the configured transcript store. TRANSCRIPT_MAX_AGE_HOURS
+    and CALL_MAX_AGE_HOURS set the freshness policy (0 never expires), and
+    GONG_OFFLINE=true serves stored calls only.
+    """
+    store = create_transcript_store()
+    if store is None:
+        return gong_client
+    return StoredGongClient(
+        gong_client, store,
+        transcript_max_age=_hours("TRANSCRIPT_MAX_AGE_HOURS", "0"),
+        call_max_age=_hours("CALL_MAX_AGE_HOURS", "24"),
+        offline=os.getenv("GONG_OFFLINE", "false").lower() == "true")
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from src.db.db_client import session_scope
+from src.db.db_models import Call, SyncState
+from src.schemas.schemas import CallResponse
+
+logger = logging.getLogger(__name__)
+
+SYNC_NAME = "gong_calls"
+
+
+class CallSync:
+    """
+    Incremental copy of Gong's call list into the `calls` table. Each run asks
+    Gong only for calls that started at or after the stored watermark (or
+    `initial_from` on the first run) and upserts them page by page. Gong does not
+    promise pages in start-time order, so the watermark only advances to the
+    newest start time seen once the whole cursor pass has succeeded; a failed
+    run starts over from the old watermark. Calls at the watermark itself are
+    fetched again and upserted idempotently, so none are lost at the edge.
+    """
+
+    def __init__(self, gong_client, interval: float = 900, initial_from: str | None = None,
+                 batch_size: int = 500):
+        self.gong_client = gong_client
+        self.interval = interval
+        self.initial_from = initial_from
+        self.batch_size = batch_size
+        self.status = {"running": False, "last_run_at": None, "last_synced": 0,
+                       "watermark": None, "last_error": None}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        """Sync now and then every `interval` seconds; an interval of 0 only syncs on demand."""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Gong call sync failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> dict:
+        """Run one sync pass unless one is already in progress, and return the sync status."""
+        if self._lock.locked():
+            return self.status
+        async with self._lock:
+            self.status["running"] = True
+            try:
+                await self._sync()
+                self.status["last_error"] = None
+            except Exception as e:
+                self.status["last_error"] = str(e)
+                raise
+            finally:
+                self.status["running"] = False
+        return self.status
+
+    async def _sync(self):
+        watermark = await asyncio.to_thread(_get_watermark)
+        from_date = watermark.isoformat() if watermark else self.initial_from
+        logger.info("Syncing Gong calls from %s", from_date or "the beginning")
+
+        synced = 0
+        newest = watermark
+        batch: List[CallResponse] = []
+        async for call in self.gong_client.iter_extensive_calls(from_date=from_date):
+            batch.append(call)
+            if len(batch) >= self.batch_size:
+                newest = _latest(newest, await asyncio.to_thread(_upsert_calls, batch))
+                synced += len(batch)
+                batch = []
+        if batch:
+            newest = _latest(newest, await asyncio.to_thread(_upsert_calls, batch))
+            synced += len(batch)
+        if newest is not None:
+            watermark = await asyncio.to_thread(_save_watermark, newest)
+
+        self.status.update(last_run_at=datetime.now(timezone.utc), last_synced=synced,
+                           watermark=watermark)
+        logger.info("Synced %d Gong calls, watermark is now %s", synced, watermark)
+
+
+def _get_watermark() -> datetime | None:
+    with session_scope() as db:
+        return db.query(SyncState.watermark).filter(SyncState.name == SYNC_NAME).scalar()
+
+
+def _latest(*values: datetime | None) -> datetime | None:
+    return max((value for value in values if value is not None), default=None)
+
+
+def _upsert_calls(calls: List[CallResponse]) -> datetime | None:
+    """Upsert one page of calls and return the newest start time among them."""
+    now = datetime.now(timezone.utc)
+    rows = {}
+    for call in calls:
+        if not call.id or not call.started:
+            continue
+        rows[call.id] = {"id": call.id, "title": call.title, "customer_name": call.customer_name,
+                         "started": datetime.fromisoformat(call.started), "synced_at": now}
+    if not rows:
+        return None
+
+    statement = insert(Call).values(list(rows.values()))
+    with session_scope() as db:
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"title": statement.excluded.title,
+                  "started": statement.excluded.started,
+                  "customer_name": statement.excluded.customer_name,
+                  "synced_at": statement.excluded.synced_at}))
+        db.commit()
+    return max(row["started"] for row in rows.values())
+
+
+def _save_watermark(watermark: datetime) -> datetime:
+    """Advance the stored watermark, never moving it backwards, and return the stored value."""
+    statement = insert(SyncState).values(name=SYNC_NAME, watermark=watermark,
+                                         last_run_at=datetime.now(timezone.utc))
+    with session_scope() as db:
+        stored = db.execute(statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"watermark": func.greatest(SyncState.watermark, statement.excluded.watermark),
+                  "last_run_at": statement.excluded.last_run_at}
+        ).returning(SyncState.watermark)).scalar_one()
+        db.commit()
+    return stored
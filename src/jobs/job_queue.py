@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from src.db.db_client import session_scope
+from src.gong.gong_client import GongClient
+from src.gong.transcript_store import StoredGongClient
+from src.processing.call_processor import process_call
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, call_ids: List[str], use_cache: bool = True):
+        self.id = uuid.uuid4().hex
+        self.call_ids = call_ids
+        self.use_cache = use_cache
+        self.status = "queued"
+        self.processed: List[str] = []
+        self.failed: dict = {}
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self._pending_chunks = 0
+
+    @property
+    def progress(self) -> float:
+        if not self.call_ids:
+            return 1.0
+        return (len(self.processed) + len(self.failed)) / len(self.call_ids)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": len(self.call_ids),
+            "processed": len(self.processed),
+            "failed": self.failed,
+            "progress": round(self.progress, 3),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def __repr__(self):
+        return f"Job(id={self.id}, status={self.status}, total={len(self.call_ids)})"
+
+
+class CallJobQueue:
+    """
+    Background queue for processing many Gong calls. Jobs are split into chunks
+    of `transcript_batch_size` calls, each chunk's transcripts and metadata are
+    fetched with one Gong request apiece, and a fixed pool of workers drains the
+    chunks so at most `workers` calls are processed at once. Finished jobs stay
+    queryable for `job_ttl`, and beyond `max_finished_jobs` the oldest are dropped.
+    """
+
+    def __init__(self, gong_client: GongClient | StoredGongClient, workers: int = 4, transcript_batch_size: int = 20,
+                 job_ttl: timedelta = timedelta(hours=24), max_finished_jobs: int = 1000):
+        self.gong_client = gong_client
+        self.workers = workers
+        self.transcript_batch_size = transcript_batch_size
+        self.job_ttl = job_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, call_ids: List[str], use_cache: bool = True) -> Job:
+        self._start()
+        self._evict_finished()
+        job = Job(list(dict.fromkeys(call_ids)), use_cache)
+        self.jobs[job.id] = job
+        for start in range(0, len(job.call_ids), self.transcript_batch_size):
+            job._pending_chunks += 1
+            self._queue.put_nowait(  # type: ignore
+                (job, job.call_ids[start:start + self.transcript_batch_size]))
+        if not job.call_ids:
+            self._finish(job)
+        logger.info("Queued job %s with %d calls", job.id, len(job.call_ids))
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def _evict_finished(self):
+        finished = sorted((job for job in self.jobs.values() if job.finished_at),
+                          key=lambda job: job.finished_at)  # type: ignore
+        cutoff = datetime.now(timezone.utc) - self.job_ttl
+        excess = len(finished) - self.max_finished_jobs
+        for position, job in enumerate(finished):
+            if position < excess or job.finished_at < cutoff:  # type: ignore
+                del self.jobs[job.id]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker())
+                       for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            job, call_ids = await self._queue.get()  # type: ignore
+            try:
+                await self._process_chunk(job, call_ids)
+            except Exception as e:
+                logger.exception("Job %s failed on calls %s", job.id, call_ids)
+                for call_id in call_ids:
+                    if call_id not in job.processed:
+                        job.failed.setdefault(call_id, str(e))
+            finally:
+                job._pending_chunks -= 1
+                if not job._pending_chunks:
+                    self._finish(job)
+                self._queue.task_done()  # type: ignore
+
+    async def _process_chunk(self, job: Job, call_ids: List[str]):
+        if job.status == "queued":
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+
+        transcription, calls = await asyncio.gather(
+            self.gong_client.get_transcription(call_ids),
+            self.gong_client.get_extensive_calls(call_ids=call_ids))
+        transcripts = {transcript.get("callId"): transcript
+                       for transcript in transcription.get("callTranscripts", [])}  # type: ignore
+        calls_by_id = {call.id: call for call in calls or []}
+
+        for call_id in call_ids:
+            if call_id not in transcripts or call_id not in calls_by_id:
+                job.failed[call_id] = "Call or transcript not found in Gong"
+                continue
+            try:
+                with session_scope() as db:
+                    await process_call({"callTranscripts": [transcripts[call_id]]},
+                                       calls_by_id[call_id], db, use_cache=job.use_cache)
+                job.processed.append(call_id)
+            except Exception as e:
+                logger.error("Failed to process call %s in job %s: %s", call_id, job.id, e)
+                job.failed[call_id] = str(e)
+
+    @staticmethod
+    def _finish(job: Job):
+        job.status = "failed" if job.failed and not job.processed else "completed"
+        job.finished_at = datetime.now(timezone.utc)
+        logger.info("Job %s %s: %d processed, %d failed", job.id, job.status,
+                    len(job.processed), len(job.failed))
@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import os
+from typing import Callable
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from src.azure import azure_client
+from src.db.db_client import session_scope
+from src.db.db_models import FEATURE_REQUEST_KEY, FeatureRequest, Topic
+from src.db.topic_stats import refresh_topics
+from src.retry import backoff
+from src.schemas.schemas import CallResponse
+from src.telemetry.tracing import span, traced
+from src.topics.dedup import NearDuplicateIndex
+from src.topics.online_clustering import OnlineClusterer
+from src.topics.topic_index import create_topic_index
+from src.topics.topic_matrix import TopicMatrix
+
+logger = logging.getLogger(__name__)
+
+# Normalized topic embeddings, kept in sync with the topics table across requests
+TOPIC_INDEX_PATH = os.getenv('TOPIC_INDEX_PATH')
+TOPIC_INDEX_SNAPSHOT_EVERY = int(os.getenv('TOPIC_INDEX_SNAPSHOT_EVERY', '1000'))
+topic_matrix = create_topic_index()
+if TOPIC_INDEX_PATH and os.path.exists(TOPIC_INDEX_PATH):
+    topic_matrix.restore(TOPIC_INDEX_PATH)
+
+# Clusters of requirements that matched no topic, shared by every call
+CLUSTER_SNAPSHOT_PATH = os.getenv('CLUSTER_SNAPSHOT_PATH')
+CLUSTER_SNAPSHOT_EVERY = int(os.getenv('CLUSTER_SNAPSHOT_EVERY', '1000'))
+clusterer_options = {
+    "threshold": float(os.getenv('CLUSTER_THRESHOLD', '0.82')),
+    "consolidate_every": int(os.getenv('CLUSTER_CONSOLIDATE_EVERY', '500')),
+    "reducer": topic_matrix.reducer,
+}
+clusterer = OnlineClusterer(**clusterer_options)
+if CLUSTER_SNAPSHOT_PATH and os.path.exists(CLUSTER_SNAPSHOT_PATH):
+    clusterer = OnlineClusterer.load(CLUSTER_SNAPSHOT_PATH, **clusterer_options)
+
+# Stored feature requests, so a call's rephrasings of earlier requests link to them.
+# Filled by warm_request_index at startup, then synced by id on every call
+request_index = NearDuplicateIndex(threshold=float(os.getenv('DEDUP_THRESHOLD', '0.92')),
+                                   reducer=topic_matrix.reducer)
+# Ids are allocated before rows commit, so each sync also rechecks this many ids below
+# the newest one it has seen, in case a concurrent transaction committed late
+REQUEST_SYNC_OVERLAP = int(os.getenv('REQUEST_SYNC_OVERLAP', '256'))
+_request_index_lock = asyncio.Lock()
+
+# Serializes topic creation so concurrent calls don't embed and add the same new title twice
+_topic_write_lock = asyncio.Lock()
+
+
+async def process_call(transcription: dict, call_data: CallResponse, db: Session,
+                       use_cache: bool = True, on_event: Callable[[str, dict], None] | None = None):
+    """
+    Extract, group and store the feature requests of one call; returns the non-empty groups.
+    `use_cache=False` forces fresh LLM extraction and titles instead of cached responses.
+    Near-duplicates of stored requests, or of another request in the call, are
+    linked to that canonical request and filed under its topic instead of being
+    grouped again, and requests another customer made in the same words are filed
+    under that customer's topic. `on_event(name, data)` receives partial results
+    as each stage finishes: "extracted", "deduplicated", "assigned", "clustered"
+    and finally "stored".
+    """
+    with span("process_call", call_id=call_data.id) as current:
+        with span("extract") as extract:
+            prompt_result = await azure_client.extract_feature_requests(
+                transcription.get("callTranscripts", []), use_cache=use_cache)
+            extract.items(len(prompt_result))
+        if on_event:
+            on_event("extracted", {"feature_requests": prompt_result})
+        with span("dedup") as dedup:
+            embeddings, duplicates, repeated, canonical_titles = await _find_duplicates(
+                db, prompt_result, call_data.customer_name)
+            dedup.items(len(duplicates) + len(repeated))
+            # A repeated request files under the topic of its own words stored for another customer
+            filed = {**duplicates, **{request: request for request in repeated}}
+        if on_event:
+            on_event("deduplicated", {"duplicates": duplicates})
+        await _sync_topic_matrix(db)
+        with span("group"):
+            # "clustered" is held back so any regrouped duplicates join the same event
+            clustered = []
+
+            def forward(name: str, data: dict):
+                if name == "clustered":
+                    clustered.extend(data["groups"])
+                elif on_event:
+                    on_event(name, data)
+
+            processed_result = await azure_client.process_feature_requests(
+                [item for item in prompt_result if item not in filed],
+                topic_matrix=topic_matrix, use_cache=use_cache, clusterer=clusterer,
+                on_event=forward)
+            unfiled = _file_duplicates(processed_result, filed, canonical_titles)
+            if unfiled:
+                # Their canonical request got no title, so group them like any other request
+                for duplicate in unfiled:
+                    duplicates.pop(duplicate, None)
+                regrouped = await azure_client.process_feature_requests(
+                    unfiled, topic_matrix=topic_matrix, use_cache=use_cache, clusterer=clusterer)
+                processed_result.extend(regrouped)
+                clustered.extend(group.to_dict() for group in regrouped)
+        if on_event and clustered:
+            on_event("clustered", {"groups": clustered})
+
+        async with _topic_write_lock:
+            await _sync_topic_matrix(db)
+            new_titles = list(dict.fromkeys(
+                item.title for item in processed_result
+                if item.title and item.title not in topic_matrix))
+            new_embeddings = await azure_client.get_embeddings(new_titles)
+
+            non_empty_results = await run_in_threadpool(
+                _store_results, db, processed_result, call_data.customer_name,
+                call_data.started, dict(zip(new_titles, new_embeddings)), duplicates)
+            topic_matrix.add(new_titles, new_embeddings)
+        stored = {feature_request for group in non_empty_results
+                  for feature_request in group["feature_requests"]}
+        request_index.add(*_select_stored(prompt_result, embeddings, stored), duplicates)
+        _snapshot_topic_matrix()
+        current.items(len(prompt_result))
+    if on_event:
+        on_event("stored", {"groups": non_empty_results})
+
+    return non_empty_results
+
+
+def _store_results(db: Session, processed_result, customer_name: str, time, new_topics: dict,
+                   duplicates: dict | None = None):
+    """
+    Write new topics and the call's feature requests in one transaction with two
+    bulk upserts. Rows are keyed by description and customer, so reprocessing a
+    call updates its rows, and a customer repeating the same words keeps the
+    earliest time it asked. The leaderboard rows of every topic the call adds to,
+    or moves a reprocessed request away from, are refreshed in the same transaction.
+    """
+    with span("db.store_results", topics=len(new_topics)) as current:
+        if new_topics:
+            db.execute(insert(Topic).values([
+                {"title": title, "embedding": TopicMatrix.encode(embedding)}
+                for title, embedding in new_topics.items()
+            ]).on_conflict_do_nothing(index_elements=["title"]))
+
+        rows = {}
+        non_empty_results = []
+        for item in processed_result:
+            if not item.title:
+                continue
+            for feature_request in item.feature_requests:
+                # A statement may only upsert each description once
+                rows[feature_request] = {
+                    "title": item.title,
+                    "customer_name": customer_name,
+                    "description": feature_request,
+                    "time": time,
+                    "canonical_description": (duplicates or {}).get(feature_request)
+                }
+            if item.feature_requests:
+                non_empty_results.append({
+                    "title": item.title,
+                    "feature_requests": list(item.feature_requests)
+                })
+
+        if rows:
+            touched = {row["title"] for row in rows.values()}
+            touched.update(title for (title,) in db.query(FeatureRequest.title).filter(
+                FeatureRequest.description.in_(list(rows)),
+                FeatureRequest.customer_name.is_not_distinct_from(customer_name)).distinct())
+            statement = insert(FeatureRequest).values(list(rows.values()))
+            db.execute(statement.on_conflict_do_update(
+                index_elements=list(FEATURE_REQUEST_KEY),
+                set_={
+                    "title": statement.excluded.title,
+                    "time": func.least(FeatureRequest.time, statement.excluded.time),
+                    "canonical_description": statement.excluded.canonical_description
+                }))
+            refresh_topics(db.connection(), touched)
+        db.commit()
+        current.items(len(rows))
+    return non_empty_results
+
+
+async def _find_duplicates(db: Session, feature_requests: list, customer_name: str | None) -> tuple:
+    """
+    Embed the call's requests and link near-duplicates to a canonical request.
+    A request another customer already made in the same words is repeated: it
+    takes over that row's link if it has one, and otherwise has no canonical
+    request of its own. Returns the embeddings, {duplicate: canonical}, the
+    repeated requests and the titles of stored canonical and repeated requests;
+    requests whose stored row no longer has a title are left to be grouped.
+    """
+    if request_index.last_id is not None:
+        await _sync_request_index(db)
+    embeddings = await azure_client.get_embeddings(feature_requests)
+    exact = await run_in_threadpool(_load_exact_duplicates, db, feature_requests, customer_name)
+    links = {duplicate: exact.get(canonical) or canonical for duplicate, canonical
+             in request_index.match(feature_requests, embeddings).items()}
+    links.update({description: canonical or description for description, canonical in exact.items()})
+    grouped = set(feature_requests) - set(links)
+    stored = {canonical for canonical in links.values() if canonical not in grouped}
+    canonical_titles = await run_in_threadpool(_load_request_titles, db, list(stored))
+    links = {duplicate: canonical for duplicate, canonical in links.items()
+             if canonical not in stored or canonical in canonical_titles}
+    duplicates = {duplicate: canonical for duplicate, canonical in links.items() if duplicate != canonical}
+    repeated = [description for description, canonical in links.items() if description == canonical]
+    logger.info("%d of %d feature requests are near-duplicates, %d repeat another customer's",
+                len(duplicates), len(feature_requests), len(repeated))
+    return embeddings, duplicates, repeated, canonical_titles
+
+
+def _file_duplicates(groups: list, duplicates: dict, canonical_titles: dict) -> list:
+    """
+    Add each duplicate to the group of its canonical request, and return the
+    duplicates whose canonical request has no title to be filed under.
+    """
+    groups_by_title = {group.title: group for group in groups if group.title}
+    titles = {**canonical_titles}
+    for group in groups:
+        titles.update(dict.fromkeys(group.feature_requests, group.title))
+    unfiled = []
+    for duplicate, canonical in duplicates.items():
+        title = titles.get(canonical)
+        if not title:
+            unfiled.append(duplicate)
+            continue
+        if title not in groups_by_title:
+            groups_by_title[title] = azure_client.FeatureRequestGroup(title, [])
+            groups.append(groups_by_title[title])
+        groups_by_title[title].feature_requests.append(duplicate)
+    return unfiled
+
+
+def _select_stored(descriptions: list, embeddings, stored: set) -> tuple:
+    positions = [position for position, description in enumerate(descriptions)
+                 if description in stored]
+    return [descriptions[position] for position in positions], np.asarray(embeddings)[positions]
+
+
+async def warm_request_index(attempts: int = 5):
+    """
+    Load every stored feature request into the request index, embedding those
+    with no cached embedding. Runs in the background at startup; until it
+    finishes, calls are only matched against requests stored since then.
+    """
+    for attempt in range(attempts):
+        try:
+            with session_scope() as db:
+                await _sync_request_index(db)
+            return
+        except Exception:
+            if attempt == attempts - 1:
+                logger.exception("Request index warm-up failed, near-duplicates are only "
+                                 "matched against requests stored since startup")
+                return
+            delay = backoff(attempt)
+            logger.exception("Request index warm-up failed, retrying in %.1fs", delay)
+            await asyncio.sleep(delay)
+
+
+async def _sync_request_index(db: Session):
+    """Load feature requests stored since the last sync, by this or another replica."""
+    async with _request_index_lock:
+        rows = await run_in_threadpool(_load_new_requests, db, request_index.last_id)
+        new_rows = [(description, canonical) for _, description, canonical in rows
+                    if description not in request_index]
+        if new_rows:
+            descriptions = [description for description, _ in new_rows]
+            matrix, missing = await run_in_threadpool(
+                azure_client.embedding_cache.get_matrix, descriptions)
+            if missing:
+                embedded = await azure_client.get_embeddings([descriptions[i] for i in missing])
+                if not matrix.shape[1]:
+                    matrix = np.zeros((len(descriptions), embedded.shape[1]), dtype=np.float32)
+                matrix[missing] = embedded
+            request_index.add(descriptions, matrix, dict(new_rows))
+            logger.info("Request index synced, %d feature requests loaded", len(request_index))
+        request_index.last_id = max([request_index.last_id or 0] + [row_id for row_id, _, _ in rows])
+
+
+def _load_new_requests(db: Session, after: int | None) -> list:
+    query = db.query(FeatureRequest.id, FeatureRequest.description,
+                     FeatureRequest.canonical_description).filter(FeatureRequest.title.is_not(None))
+    if after is not None:
+        query = query.filter(FeatureRequest.id > after - REQUEST_SYNC_OVERLAP)
+    return query.order_by(FeatureRequest.id).all()
+
+
+def _load_exact_duplicates(db: Session, descriptions: list, customer_name: str | None) -> dict:
+    """
+    {description: canonical} for descriptions stored for other customers but not
+    this one, with None as the canonical of rows that are not duplicates.
+    """
+    if not descriptions:
+        return {}
+    rows = db.query(FeatureRequest.description, FeatureRequest.customer_name,
+                    FeatureRequest.canonical_description).filter(
+        FeatureRequest.description.in_(descriptions)).all()
+    own = {description for description, customer, _ in rows if customer == customer_name}
+    exact = {}
+    for description, _, canonical in rows:
+        if description not in own:
+            exact[description] = exact.get(description) or canonical
+    return exact
+
+
+def _load_request_titles(db: Session, descriptions: list) -> dict:
+    if not descriptions:
+        return {}
+    return {description: title for description, title in db.query(
+        FeatureRequest.description, FeatureRequest.title).filter(
+        FeatureRequest.description.in_(descriptions), FeatureRequest.title.is_not(None))}
+
+
+@traced("db.topic_sync")
+async def _sync_topic_matrix(db: Session):
+    """Load topics created since the last sync, embedding any that have no stored vector."""
+    topics = await run_in_threadpool(_load_new_topics, db)
+    if not topics:
+        return
+
+    stored = [topic for topic in topics if topic.embedding is not None]
+    topic_matrix.add([topic.title for topic in stored],
+                     [TopicMatrix.decode(topic.embedding) for topic in stored])
+
+    missing = [topic for topic in topics if topic.embedding is None]
+    if missing:
+        embeddings = await azure_client.get_embeddings(
+            [topic.title for topic in missing])
+        for topic, embedding in zip(missing, embeddings):
+            topic.embedding = TopicMatrix.encode(embedding)
+        await run_in_threadpool(db.commit)
+        topic_matrix.add([topic.title for topic in missing], embeddings)
+    logger.info("Topic matrix synced, %d topics loaded", len(topic_matrix))
+    _snapshot_topic_matrix()
+
+
+def _load_new_topics(db: Session) -> list[Topic]:
+    titles = [title for (title,) in db.query(Topic.title).all()
+              if title not in topic_matrix]
+    if not titles:
+        return []
+    return db.query(Topic).filter(Topic.title.in_(titles)).all()
+
+
+def _snapshot_topic_matrix():
+    if TOPIC_INDEX_PATH and topic_matrix.unsaved >= TOPIC_INDEX_SNAPSHOT_EVERY:
+        topic_matrix.save(TOPIC_INDEX_PATH)
+        logger.info("Topic index snapshot written to %s", TOPIC_INDEX_PATH)
+    if CLUSTER_SNAPSHOT_PATH and clusterer.unsaved >= CLUSTER_SNAPSHOT_EVERY:
+        clusterer.save(CLUSTER_SNAPSHOT_PATH)
+        logger.info("Cluster snapshot written to %s", CLUSTER_SNAPSHOT_PATH)
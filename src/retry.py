@@ -0,0 +1,6 @@
+import random
+
+
+def backoff(attempt: int, cap: float = 30.0) -> float:
+    """Exponential backoff for a zero-based retry attempt, capped and jittered to 50-100%."""
+    return min(cap, 2 ** attempt) * (0.5 + random.random() / 2)
@@ -1,125 +1,338 @@
+import asyncio
+import base64
+import binascii
+import json
 import logging
 import os
+from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
-from requests import HTTPError
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from httpx import HTTPStatusError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.azure import azure_client
-from src.schemas.schemas import CallResponse
-from src.db.db_client import get_session
+from src.schemas.schemas import CallResponse, ProcessCallsRequest
+from src.db.db_client import AsyncSessionLocal, get_async_session, get_session, session_scope
+from src.db.customer_cache import customer_cache
 from src.gong.gong_client import GongClient
-from src.db.db_models import Customer, FeatureRequest, Topic
+from src.gong.transcript_store import create_stored_gong_client
+from src.db.db_models import Call, Customer, FeatureRequest, TopicStats
+from src.jobs.call_sync import CallSync
+from src.jobs.job_queue import CallJobQueue
+from src.processing.call_processor import process_call
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-gong_client = GongClient(os.getenv('GONG_USERNAME'),  # type: ignore
-                         os.getenv('GONG_PASSWORD'))  # type: ignore
+# Calls and transcripts already fetched are served from the local transcript store
+gong_client = create_stored_gong_client(GongClient(
+    os.getenv('GONG_USERNAME'),  # type: ignore
+    os.getenv('GONG_PASSWORD'),  # type: ignore
+    base_url=os.getenv('GONG_BASE_URL', 'https://api.gong.io/v2'),
+    max_connections=int(os.getenv('GONG_MAX_CONNECTIONS', '10')),
+    concurrency=int(os.getenv('GONG_CONCURRENCY', '3')),
+    max_retries=int(os.getenv('GONG_MAX_RETRIES', '5'))))
+job_queue = CallJobQueue(gong_client,
+                         workers=int(os.getenv('JOB_WORKERS', '4')),
+                         transcript_batch_size=int(os.getenv('JOB_TRANSCRIPT_BATCH_SIZE', '20')),
+                         job_ttl=timedelta(hours=float(os.getenv('JOB_TTL_HOURS', '24'))),
+                         max_finished_jobs=int(os.getenv('JOB_MAX_FINISHED', '1000')))
+call_sync = CallSync(gong_client,
+                     interval=float(os.getenv('GONG_SYNC_INTERVAL_SECONDS', '900')),
+                     initial_from=os.getenv('GONG_SYNC_START', '2024-11-01T00:00:00-08:00'))
+# Streamed processing keeps running if the client disconnects, so its results are still stored
+_processing_tasks: set = set()
 
 
 @router.get("/calls")
-async def get_calls(db: Session = Depends(get_session)):
-    try:
-        calls = gong_client.get_extensive_calls()
-        if calls:
-            return _filter_calls(calls, db)
+async def get_calls(from_date: datetime | None = Query(None),
+                    to_date: datetime | None = Query(None),
+                    db: Session = Depends(get_session)):
+    """Calls synced from Gong that belong to a known customer, newest first."""
+    return await run_in_threadpool(_list_calls, db, from_date, to_date)
+
 
-    except HTTPError as e:
-        logger.error("Failed to get calls: %s", e.response.text)
+@router.post("/calls/sync")
+async def post_calls_sync():
+    """Pull calls newer than the sync watermark from Gong now."""
+    try:
+        return await call_sync.run_once()
+    except HTTPStatusError as e:
+        logger.error("Failed to sync calls: %s", e.response.text)
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@router.get("/calls/sync")
+async def get_calls_sync():
+    return call_sync.status
+
+
 @router.get("/calls/{call_id}/process")
-async def get_call_process(call_id: str, db: Session = Depends(get_session)):
+async def get_call_process(call_id: str,
+                           bypass_cache: bool = Query(False, description="Ignore cached LLM responses"),
+                           output: str = Query("json", alias="format", pattern="^(json|ndjson)$",
+                                               description="ndjson streams progress events"),
+                           db: Session = Depends(get_session)):
+    if output == "ndjson":
+        return StreamingResponse(_stream_call_process(call_id, use_cache=not bypass_cache),
+                                 media_type="application/x-ndjson")
     try:
-        transcription: dict = gong_client.get_transcription(
-            [call_id])  # type: ignore
-        prompt_result = azure_client.generate_fr_from_call(
-            str(transcription.get("callTranscripts")))
-        topics = db.query(Topic).all()
-        topic_titles = [topic.title for topic in topics]
-        processed_result = azure_client.process_feature_requests(
-            prompt_result, distance_threshold=0.6, titles=topic_titles)
-
-        call_extensive_data = gong_client.get_extensive_calls(
-            call_id)[0]  # type: ignore
-        customer_name = call_extensive_data.customer_name  # type: ignore
-        time = call_extensive_data.started
-        new_titles = []
-        for item in processed_result:
-            if item.title and item.title not in topic_titles:
-                new_titles.append(item.title)
-                new_topic = Topic(title=item.title)
-                db.add(new_topic)
-        
-        db.commit()  # Commit new topics before adding feature requests
-
-        non_empty_results = []
-        for item in processed_result:
-            feature_requests = []
-            for feature_request in item.feature_requests:
-                if item.title:
-                    new_feature_request = FeatureRequest(
-                        title=item.title,
-                        customer_name=customer_name,
-                        description=feature_request,
-                        time=time
-                    )
-                    db.add(new_feature_request)
-                    feature_requests.append(feature_request)
-            
-            if feature_requests:
-                non_empty_results.append({
-                    "title": item.title,
-                    "feature_requests": feature_requests
-                })
-        db.commit()
-
-        return non_empty_results
-
-    except HTTPError as e:
+        transcription, call_data = await _fetch_call(call_id)
+        return await process_call(transcription, call_data, db, use_cache=not bypass_cache)
+
+    except HTTPStatusError as e:
         logger.error("Failed to get transcription for call %s: %s",
                      call_id, e.response.text)
         raise HTTPException(status_code=500, detail=str(e)) from e
-    
+
+
+async def _fetch_call(call_id: str) -> tuple[dict, CallResponse]:
+    # The transcript and the call metadata are independent, fetch them together
+    transcription, call_extensive_data = await asyncio.gather(
+        gong_client.get_transcription([call_id]),
+        gong_client.get_extensive_calls(call_id))
+    return transcription, call_extensive_data[0]  # type: ignore
+
+
+async def _stream_call_process(call_id: str, use_cache: bool):
+    """
+    Process a call in a background task and yield one NDJSON line per event:
+    "fetched", then the stages process_call reports ("extracted", "assigned",
+    "clustered", "stored"), and finally "done" or "error".
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: dict):
+        events.put_nowait({"event": event, **data})
+
+    async def run():
+        try:
+            transcription, call_data = await _fetch_call(call_id)
+            emit("fetched", {"call": call_data})
+            # The task can outlive the request, so it opens its own session
+            with session_scope() as db:
+                await process_call(transcription, call_data, db, use_cache=use_cache, on_event=emit)
+            emit("done", {})
+        except Exception as e:
+            logger.exception("Failed to process call %s", call_id)
+            detail = e.response.text if isinstance(e, HTTPStatusError) else str(e)
+            emit("error", {"detail": detail})
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.create_task(run())
+    _processing_tasks.add(task)
+    task.add_done_callback(_processing_tasks.discard)
+    while (event := await events.get()) is not None:
+        yield json.dumps(jsonable_encoder(event)) + "\n"
+
+
+@router.post("/calls/process")
+async def post_calls_process(request: ProcessCallsRequest, db: Session = Depends(get_session)):
+    """Queue many calls for background processing and return the job to poll."""
+    call_ids = request.call_ids
+    if not call_ids:
+        if not (request.from_date and request.to_date):
+            raise HTTPException(
+                status_code=400, detail="Provide call_ids or both from_date and to_date")
+        calls = await run_in_threadpool(_list_calls, db, request.from_date, request.to_date)
+        call_ids = [call.id for call in calls]
+
+    return job_queue.submit(call_ids, use_cache=not request.bypass_cache).to_dict()
+
+
+@router.get("/calls/jobs")
+async def get_jobs():
+    return [job.to_dict() for job in job_queue.jobs.values()]
+
+
+@router.get("/calls/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
 @router.get("/calls/processed")
-async def get_processed_calls(db: Session = Depends(get_session)):
+async def get_processed_calls(
+        limit: int | None = Query(None, ge=1, le=500,
+                                  description="Topics per page, defaults to 50 for JSON and all for NDJSON"),
+        cursor: str | None = Query(None, description="next_cursor from the previous page"),
+        customer: str | None = Query(None),
+        from_date: datetime | None = Query(None),
+        to_date: datetime | None = Query(None),
+        min_score: int | None = Query(None, description="Minimum aggregate topic score"),
+        topic: str | None = Query(None, description="Substring of the topic title"),
+        output: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+        db: AsyncSession = Depends(get_async_session)):
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
     try:
-        feature_requests = db.query(FeatureRequest).all()
-        result = {}
-        for fr in feature_requests:
-            if fr.title not in result:
-                result[fr.title] = {
-                    "title": fr.title,
-                    "feature_requests": [],
-                    "score": 0
-                }
-            customer = db.query(Customer).filter(Customer.name == fr.customer_name).first()
-            customer_score = customer.score if customer else 0
-            result[fr.title]["feature_requests"].append({
-                "time": fr.time,
-                "score": customer_score,
-                "description": fr.description,
-                "customer": fr.customer_name
-            })
-            result[fr.title]["score"] += customer_score
-
-        return list(result.values())
+        filters = ProcessedFilters(customer, from_date, to_date, min_score, topic)
+        if output == "ndjson":
+            # The generator outlives this request's session, so it opens its own
+            async def stream():
+                async with AsyncSessionLocal() as stream_db:
+                    rows = await stream_db.stream(_processed_statement(filters, after, limit))
+                    async for group in _group_topics(rows):
+                        yield json.dumps(jsonable_encoder(group)) + "\n"
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+        limit = limit or 50
+        rows = await db.stream(_processed_statement(filters, after, limit))
+        topics = [group async for group in _group_topics(rows)]
+        next_cursor = None
+        if len(topics) == limit:
+            next_cursor = _encode_cursor(topics[-1]["score"], topics[-1]["title"])
+        return {"topics": topics, "next_cursor": next_cursor}
 
     except Exception as e:
         logger.error("Failed to get processed calls: %s", str(e))
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+class ProcessedFilters:
+    def __init__(self, customer: str | None, from_date: datetime | None, to_date: datetime | None,
+                 min_score: int | None, topic: str | None):
+        self.customer = customer
+        self.from_date = from_date
+        self.to_date = to_date
+        self.min_score = min_score
+        self.topic = topic
+
+    def by_request(self) -> bool:
+        """Whether the filters select individual requests, so topic totals must be recomputed."""
+        return bool(self.customer or self.from_date or self.to_date)
+
+    def clauses(self) -> list:
+        clauses = []
+        if self.customer:
+            clauses.append(func.lower(FeatureRequest.customer_name) == self.customer.lower())
+        if self.from_date:
+            clauses.append(FeatureRequest.time >= self.from_date)
+        if self.to_date:
+            clauses.append(FeatureRequest.time < self.to_date)
+        if self.topic:
+            clauses.append(FeatureRequest.title.icontains(self.topic, autoescape=True))
+        return clauses
+
+
+def _processed_statement(filters: ProcessedFilters, after: tuple | None, limit: int | None):
+    """
+    Feature request rows for one page of topics, ordered by aggregate topic score.
+    Topics are ranked in a subquery and paged by keyset on (score, title), so
+    deep pages cost the same as the first one. A topic scores the sum of its
+    distinct customers' scores. Without customer or date filters the ranking is
+    read from the precomputed topic_stats leaderboard.
+    """
+    customer_score = func.coalesce(Customer.score, 0)
+    if filters.by_request():
+        askers = select(FeatureRequest.title, FeatureRequest.customer_name).where(
+            *filters.clauses()).distinct().subquery()
+        topic_score = func.sum(customer_score)
+        topics = select(
+            askers.c.title.label("title"),
+            topic_score.label("score")
+        ).outerjoin(
+            Customer, Customer.name == askers.c.customer_name
+        ).group_by(askers.c.title)
+        if filters.min_score is not None:
+            topics = topics.having(topic_score >= filters.min_score)
+    else:
+        topics = select(TopicStats.title.label("title"), TopicStats.score.label("score"))
+        if filters.topic:
+            topics = topics.where(TopicStats.title.icontains(filters.topic, autoescape=True))
+        if filters.min_score is not None:
+            topics = topics.where(TopicStats.score >= filters.min_score)
+    topics = topics.subquery()
+
+    page = select(topics)
+    if after:
+        score, title = after
+        page = page.where(or_(topics.c.score < score,
+                              and_(topics.c.score == score, topics.c.title > title)))
+    page = page.order_by(topics.c.score.desc(), topics.c.title).limit(limit).subquery()
+
+    return select(
+        page.c.title,
+        page.c.score.label("topic_score"),
+        FeatureRequest.description,
+        FeatureRequest.time,
+        FeatureRequest.customer_name,
+        FeatureRequest.canonical_description,
+        customer_score.label("score")
+    ).join(
+        FeatureRequest, FeatureRequest.title == page.c.title
+    ).outerjoin(
+        Customer, Customer.name == FeatureRequest.customer_name
+    ).where(*filters.clauses()).order_by(
+        page.c.score.desc(), page.c.title, FeatureRequest.time
+    ).execution_options(yield_per=1000)
+
+
+async def _group_topics(rows):
+    """Fold consecutive rows of the same title into topic dicts, yielding each when complete."""
+    group = None
+    async for row in rows:
+        if group is None or group["title"] != row.title:
+            if group is not None:
+                yield group
+            group = {
+                "title": row.title,
+                "feature_requests": [],
+                "score": row.topic_score
+            }
+        group["feature_requests"].append({
+            "time": row.time,
+            "score": row.score,
+            "description": row.description,
+            "customer": row.customer_name,
+            "duplicate_of": row.canonical_description
+        })
+    if group is not None:
+        yield group
+
+
+def _encode_cursor(score: int, title: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, title]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        score, title = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+    return score, title
+
+
+def _list_calls(db: Session, from_date: datetime | None, to_date: datetime | None):
+    query = db.query(Call)
+    if from_date:
+        query = query.filter(Call.started >= from_date)
+    if to_date:
+        query = query.filter(Call.started < to_date)
+    calls = [CallResponse(id=call.id, title=call.title, started=call.started.isoformat(),  # type: ignore
+                          customer_name=call.customer_name)  # type: ignore
+             for call in query.order_by(Call.started.desc())]
+    return _filter_calls(calls, db)
+
+
 def _filter_calls(calls: list[CallResponse], db: Session):
+    """Keep calls whose customer is in the customers table, attaching its score."""
     filtered_calls = []
     for call in calls:
         customer_name = call.customer_name
         if customer_name:
-            customer = db.query(Customer).filter(func.lower(
-                Customer.name) == customer_name.lower()).first()
+            customer = customer_cache.lookup(db, customer_name)
             if customer:
+                call.customer_score = customer.score
                 filtered_calls.append(call)
     return filtered_calls
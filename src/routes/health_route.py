@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+
+from src.azure import azure_client
+from src.db.db_client import get_pool_stats
+
+router = APIRouter()
+
+
+@router.get("/health/db")
+async def get_db_health():
+    """Connection pool usage: size, checked out connections, overflow and checkout wait times."""
+    return get_pool_stats()
+
+
+@router.get("/health/cache")
+async def get_cache_health():
+    """Hit/miss counters of the embedding and LLM response caches."""
+    return {
+        "embeddings": azure_client.embedding_cache.stats(),
+        "llm_responses": azure_client.llm_cache.stats(),
+    }
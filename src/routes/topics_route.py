@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db_client import get_async_session
+from src.db.db_models import TopicRollup, TopicStats
+
+router = APIRouter()
+
+
+@router.get("/topics/leaderboard")
+async def get_leaderboard(limit: int = Query(50, ge=1, le=500),
+                          offset: int = Query(0, ge=0),
+                          min_score: int | None = Query(None, description="Minimum aggregate topic score"),
+                          topic: str | None = Query(None, description="Substring of the topic title"),
+                          db: AsyncSession = Depends(get_async_session)):
+    """Topics ranked by the summed score of the customers asking for them."""
+    statement = select(TopicStats)
+    if min_score is not None:
+        statement = statement.where(TopicStats.score >= min_score)
+    if topic:
+        statement = statement.where(TopicStats.title.icontains(topic, autoescape=True))
+    statement = statement.order_by(TopicStats.score.desc(), TopicStats.title).offset(offset).limit(limit)
+    return [{
+        "title": stats.title,
+        "score": stats.score,
+        "requests": stats.requests,
+        "customers": stats.customers,
+        "first_seen": stats.first_seen,
+        "last_seen": stats.last_seen,
+    } for stats in (await db.execute(statement)).scalars()]
+
+
+@router.get("/topics/trends")
+async def get_trends(period: str = Query("week", pattern="^(week|month)$"),
+                     title: list[str] | None = Query(None, description="Topics to chart"),
+                     top: int = Query(10, ge=1, le=100,
+                                      description="Chart the top N topics when no title is given"),
+                     from_date: datetime | None = Query(None),
+                     to_date: datetime | None = Query(None),
+                     db: AsyncSession = Depends(get_async_session)):
+    """Score, request and customer counts per topic and week or month, oldest bucket first."""
+    titles = title or (await db.execute(
+        select(TopicStats.title).order_by(TopicStats.score.desc(), TopicStats.title).limit(top)
+    )).scalars().all()
+
+    statement = select(TopicRollup).where(TopicRollup.period == period,
+                                          TopicRollup.title.in_(titles))
+    if from_date:
+        statement = statement.where(TopicRollup.bucket >= from_date)
+    if to_date:
+        statement = statement.where(TopicRollup.bucket < to_date)
+
+    buckets = {topic: [] for topic in titles}
+    for rollup in (await db.execute(statement.order_by(TopicRollup.bucket))).scalars():
+        buckets[rollup.title].append({
+            "bucket": rollup.bucket,
+            "score": rollup.score,
+            "requests": rollup.requests,
+            "customers": rollup.customers,
+        })
+    return [{"title": topic, "buckets": topic_buckets} for topic, topic_buckets in buckets.items()]
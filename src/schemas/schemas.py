@@ -1,9 +1,24 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
 class CallResponse:
-    def __init__(self, id: str, title: str, started: str, customer_name: str):
+    def __init__(self, id: str, title: str, started: str, customer_name: str,
+                 customer_score: int | None = None):
         self.id = id
         self.title = title
         self.started = started
         self.customer_name = customer_name
+        self.customer_score = customer_score
 
     def __repr__(self):
-        return f"CallResponse(id={self.id}, title={self.title}, started={self.started}, customer_name={self.customer_name})"
+        return f"CallResponse(id={self.id}, title={self.title}, started={self.started}, customer_name={self.customer_name}, customer_score={self.customer_score})"
+
+
+class ProcessCallsRequest(BaseModel):
+    """Calls to process in the background, either by ID or by a Gong date range."""
+    call_ids: list[str] | None = None
+    from_date: datetime | None = None
+    to_date: datetime | None = None
+    bypass_cache: bool = False
@@ -4,7 +4,7 @@ import openai
 import numpy as np
 from sklearn.cluster import AgglomerativeClustering
 from collections import defaultdict
-import time
+import asyncio
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -13,12 +13,19 @@ import uvicorn
 import logging
 import os
 
+from src.azure.rate_limiter import get_limiter
+from src.gong.transcript import estimate_tokens
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Embedding requests accept up to 2048 inputs; keep batches well under the token limit
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "200000"))
+
 # Load the API key from a file
 try:
     with open('api_key.txt', 'r') as f:
@@ -31,25 +38,59 @@ except FileNotFoundError:
 # Serve static files for HTML and assets
 app.mount("/static", StaticFiles(directory="."), name="static")
 
-# Define a function to handle retries in case of rate limit errors
-def get_embedding_with_retry(text, retries=3, delay=5):
-    """Fetch embedding with retries and delay in case of rate limit errors."""
-    for attempt in range(retries):
-        try:
-            response = openai.Embedding.create(
-                input=text,
-                model="text-embedding-ada-002"
-            )
-            logger.info(f"Embedding generated for text: {text[:50]}...")
-            return response['data'][0]['embedding']
-        except openai.error.RateLimitError:
-            logger.warning(f"Rate limit hit for text: {text[:50]}. Retrying in {delay} seconds...")
-            time.sleep(delay)  # Wait before retrying
-    logger.error(f"Failed to get embedding after {retries} retries for text: {text[:50]}")
-    raise Exception("Failed to get embedding after retries")
+# Rate limits, backoff and Retry-After are handled by the shared per-model limiter
+async def get_embeddings_with_retry(texts):
+    """Fetch embeddings for a batch of texts, waiting out rate limits without blocking the server."""
+    response = await get_limiter("text-embedding-ada-002").call(
+        lambda: openai.Embedding.acreate(
+            input=texts,
+            model="text-embedding-ada-002"
+        ),
+        tokens=sum(map(estimate_tokens, texts)))
+    logger.info(f"Embeddings generated for a batch of {len(texts)} texts.")
+    # Map results back to their inputs by index
+    embeddings = [None] * len(texts)
+    for item in response['data']:
+        embeddings[item['index']] = item['embedding']
+    return embeddings
+
+async def get_embedding_with_retry(text):
+    """Fetch the embedding of a single text."""
+    return (await get_embeddings_with_retry([text]))[0]
+
+# Pack texts into batches that respect the per-request item and token limits
+def batch_texts(texts, max_items=EMBEDDING_BATCH_SIZE, max_tokens=EMBEDDING_BATCH_TOKENS):
+    """Yield batches of texts; tokens are estimated at four characters each."""
+    batch, batch_tokens = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+async def get_embeddings(texts):
+    """Embed all texts in as few requests as possible, splitting batches the API rejects."""
+    embeddings = []
+    for batch_embeddings in await asyncio.gather(*map(_embed_or_split, batch_texts(texts))):
+        embeddings.extend(batch_embeddings)
+    return embeddings
+
+async def _embed_or_split(batch):
+    try:
+        return await get_embeddings_with_retry(batch)
+    except openai.error.InvalidRequestError:
+        if len(batch) == 1:
+            raise
+        logger.warning(f"Embedding batch of {len(batch)} rejected, splitting it in half.")
+        middle = len(batch) // 2
+        return await _embed_or_split(batch[:middle]) + await _embed_or_split(batch[middle:])
 
 # Generate a title for each group based on its content
-def generate_group_title(requirements: List[str]) -> str:
+async def generate_group_title(requirements: List[str]) -> str:
     """Generate a title for a group of requirements using GPT-3.5 and clean it up."""
     prompt = (
         "Create a concise and descriptive title for a group of customer requirements "
@@ -59,15 +100,17 @@ def generate_group_title(requirements: List[str]) -> str:
     )
     
     # Using gpt-3.5-turbo model
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=10,
-        temperature=0.7
-    )
+    response = await get_limiter("gpt-3.5-turbo").call(
+        lambda: openai.ChatCompletion.acreate(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=10,
+            temperature=0.7
+        ),
+        tokens=estimate_tokens(prompt) + 10)
     
     # Clean up the title to ensure it doesn't have any stray quotation marks
     title = response['choices'][0]['message']['content'].strip()
@@ -102,14 +145,11 @@ async def cluster_requirements(distance_threshold: float = Query(0.7, descriptio
         raise HTTPException(status_code=404, detail="customer_requirements.txt not found")
     
     # Generate embeddings
-    embeddings = []
-    for req in customer_requirements:
-        embedding = get_embedding_with_retry(req)
-        embeddings.append(embedding)
+    embeddings = await get_embeddings(customer_requirements)
     logger.info("All embeddings generated successfully.")
 
     # Convert embeddings to a NumPy array
-    embedding_array = np.array(embeddings)
+    embedding_array = np.array(embeddings, dtype=np.float32)
 
     # Perform hierarchical clustering using the user-specified distance_threshold
     cluster = AgglomerativeClustering(n_clusters=None, 
@@ -127,8 +167,8 @@ async def cluster_requirements(distance_threshold: float = Query(0.7, descriptio
     for label, requirement in zip(labels, customer_requirements):
         groups[label].append(requirement)
 
-    for label, requirements in groups.items():
-        title = generate_group_title(requirements)
+    titles = await asyncio.gather(*map(generate_group_title, groups.values()))
+    for (label, requirements), title in zip(groups.items(), titles):
         groups_with_titles[label] = {"title": title, "requirements": requirements}
 
     logger.info(f"Organized requirements into {len(groups_with_titles)} groups with titles.")
@@ -113,7 +113,7 @@ async def cluster_requirements(distance_threshold: float = Query(0.7, descriptio
     logger.info("All embeddings generated successfully.")
 
     # Convert embeddings to a NumPy array
-    embedding_array = np.array(embeddings)
+    embedding_array = np.array(embeddings, dtype=np.float32)
 
     # Perform hierarchical clustering using the user-specified distance_threshold
     cluster = AgglomerativeClustering(n_clusters=None, 
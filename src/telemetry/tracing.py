@@ -0,0 +1,134 @@
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - OpenTelemetry is optional
+    otel_trace = None
+
+# TRACING=otel also emits OpenTelemetry spans; the exporter is configured by the OTel SDK
+_tracer = None
+if os.getenv("TRACING", "none") == "otel":
+    if otel_trace is None:
+        logger.warning("TRACING=otel but opentelemetry is not installed, spans are disabled")
+    else:
+        _tracer = otel_trace.get_tracer("featbull")
+
+STAGE_SECONDS = Histogram(
+    "featbull_stage_duration_seconds", "Time spent in each processing stage",
+    ["stage", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+STAGE_ITEMS = Counter(
+    "featbull_stage_items_total", "Items handled by each processing stage", ["stage"])
+LLM_TOKENS = Counter(
+    "featbull_llm_tokens_total", "Tokens reported by Azure OpenAI", ["stage", "kind"])
+OPENAI_RETRIES = Counter(
+    "featbull_openai_retries_total", "Azure OpenAI requests retried", ["deployment", "reason"])
+OPENAI_CONCURRENCY_LIMIT = Gauge(
+    "featbull_openai_concurrency_limit", "Adaptive concurrency limit per deployment", ["deployment"])
+HTTP_SECONDS = Histogram(
+    "featbull_http_request_duration_seconds", "API request latency", ["method", "route", "status"])
+
+
+class Span:
+    """Attributes of one timed stage, mirrored onto an OpenTelemetry span when tracing is on."""
+
+    def __init__(self, name: str, otel_span=None):
+        self.name = name
+        self.attributes: dict = {}
+        self._otel_span = otel_span
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def items(self, count: int):
+        """Record how many items (texts, calls, rows) this stage handled."""
+        self.set("items", count)
+        STAGE_ITEMS.labels(self.name).inc(count)
+
+    def tokens(self, usage: dict):
+        """Record the prompt and completion token counts of an OpenAI response."""
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                self.set(kind, usage[kind])
+                LLM_TOKENS.labels(self.name, kind.split("_")[0]).inc(usage[kind])
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time a stage into the stage histogram, and trace it when OpenTelemetry is enabled."""
+    start = time.perf_counter()
+    status = "ok"
+    otel_context = _tracer.start_as_current_span(name) if _tracer else None
+    otel_span = otel_context.__enter__() if otel_context else None
+    current = Span(name, otel_span)
+    for key, value in attributes.items():
+        current.set(key, value)
+    try:
+        yield current
+    except BaseException as e:
+        status = "error"
+        if otel_context:
+            otel_context.__exit__(type(e), e, e.__traceback__)
+            otel_context = None
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name, status).observe(elapsed)
+        if otel_context:
+            otel_context.__exit__(None, None, None)
+        logger.debug("%s took %.3fs %s", name, elapsed, current.attributes)
+
+
+def traced(name: str):
+    """Wrap an async function in a span of its own."""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class LatencyMiddleware:
+    """
+    ASGI middleware observing request latency per route template, so
+    /calls/{call_id}/process is one series. The inner app returns only after
+    the last body chunk is sent, so streamed responses are timed to the end of
+    the stream rather than to their headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.labels(scope["method"], getattr(route, "path", "unmatched"),
+                                str(status)).observe(time.perf_counter() - start)
@@ -0,0 +1,72 @@
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from src.topics.topic_matrix import TopicMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class NearDuplicateIndex:
+    """
+    Stored feature requests in a TopicMatrix keyed by description, with the
+    canonical request each duplicate links to. A call's requests are matched
+    against every stored request in one similarity pass, and against each other,
+    so rephrasings like "SSO with Okta" and "Okta SSO support" collapse onto the
+    first one seen.
+    """
+
+    def __init__(self, threshold: float = 0.92, reducer=None):
+        self.threshold = threshold
+        self.matrix = TopicMatrix(reducer=reducer)
+        # Description -> canonical description, for duplicates only
+        self.canonical: Dict[str, str] = {}
+        # Highest feature_requests id loaded so far, None until the index is warmed
+        self.last_id: int | None = None
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __contains__(self, description: str):
+        return description in self.matrix
+
+    def add(self, descriptions: List[str], embeddings, canonical: Dict[str, str] | None = None):
+        self.matrix.add(descriptions, embeddings)
+        for description in descriptions:
+            target = (canonical or {}).get(description)
+            # A request linked to another customer's row in the same words is that row
+            if target and target != description:
+                self.canonical[description] = target
+
+    def match(self, descriptions: List[str], embeddings) -> Dict[str, str]:
+        """
+        Map each description that nearly duplicates a stored request, or an earlier
+        description in the same batch, to the canonical request it should link to.
+        A description never links to itself, e.g. a canonical request being
+        reprocessed whose nearest neighbour is one of its own duplicates.
+        """
+        if not descriptions:
+            return {}
+        links = {}
+        if len(self.matrix):
+            # Two neighbours, so a request being reprocessed can skip its own row
+            indices, scores = self.matrix.search(embeddings, k=2)
+            for description, row_indices, row_scores in zip(descriptions, indices, scores):
+                for index, score in zip(row_indices, row_scores):
+                    match = self.matrix.titles[index]
+                    if match == description:
+                        continue
+                    if score >= self.threshold:
+                        links[description] = self.canonical.get(match, match)
+                    break
+
+        queries = self.matrix.project(embeddings)
+        earlier = np.tril(queries @ queries.T >= self.threshold, k=-1)
+        for position in np.flatnonzero(earlier.any(axis=1)):
+            description = descriptions[position]
+            if description not in links:
+                first = descriptions[int(np.argmax(earlier[position]))]
+                links[description] = links.get(first, first)
+        return {description: canonical for description, canonical in links.items()
+                if canonical != description}
@@ -0,0 +1,183 @@
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from src.topics.topic_matrix import TopicMatrix, load_snapshot, save_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class OnlineClusterer:
+    """
+    Incremental clustering of requirement embeddings across calls. Each cluster
+    keeps a running sum of its unit vectors, so its centroid is updated in place
+    as members arrive. A new vector joins the closest centroid when their cosine
+    similarity reaches `threshold` and opens a new cluster otherwise, which
+    costs one matrix-vector product per item instead of re-clustering.
+
+    Every `consolidate_every` items, clusters whose centroids have drifted to
+    within `merge_threshold` of each other are merged. Merged clusters keep
+    their IDs as aliases of the surviving one, so IDs handed out earlier stay
+    valid; resolve them with `find`. With a `reducer`, vectors are projected
+    to its smaller float32 space before clustering.
+    """
+
+    def __init__(self, threshold: float = 0.82, merge_threshold: float | None = None,
+                 consolidate_every: int = 500, block_size: int = 1024, reducer=None):
+        self.threshold = threshold
+        self.reducer = reducer
+        self.merge_threshold = merge_threshold if merge_threshold is not None else threshold
+        self.consolidate_every = consolidate_every
+        self.block_size = block_size
+        self.sums = np.empty((0, 0), dtype=np.float32)
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.titles: List[str | None] = []
+        self._parent: List[int] = []
+        self._size = 0
+        self._since_consolidation = 0
+        # Items added since the last snapshot was written
+        self.unsaved = 0
+
+    def __len__(self):
+        """Number of live (not merged away) clusters."""
+        return int(np.count_nonzero(self.counts[:self._size]))
+
+    def _grow(self, dim: int):
+        # Double the backing arrays so appending a cluster is amortized O(1)
+        capacity = max(64, 2 * len(self.counts))
+        sums = np.zeros((capacity, dim), dtype=np.float32)
+        centroids = np.zeros((capacity, dim), dtype=np.float32)
+        counts = np.zeros(capacity, dtype=np.int64)
+        if self._size:
+            sums[:self._size] = self.sums[:self._size]
+            centroids[:self._size] = self.centroids[:self._size]
+            counts[:self._size] = self.counts[:self._size]
+        self.sums, self.centroids, self.counts = sums, centroids, counts
+
+    def partial_fit(self, vectors) -> np.ndarray:
+        """Assign each vector to a cluster, opening clusters as needed; returns cluster IDs."""
+        if self.reducer:
+            vectors = self.reducer.project(vectors)
+        else:
+            vectors = TopicMatrix.normalize(vectors)
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for i, vector in enumerate(vectors):
+            best = -1
+            if self._size:
+                similarities = self.centroids[:self._size] @ vector
+                similarities[self.counts[:self._size] == 0] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] < self.threshold:
+                    best = -1
+
+            if best < 0:
+                if self._size == len(self.counts):
+                    self._grow(len(vector))
+                best = self._size
+                self._size += 1
+                self.titles.append(None)
+                self._parent.append(best)
+            self.sums[best] += vector
+            self.counts[best] += 1
+            self.centroids[best] = TopicMatrix.normalize(self.sums[best])[0]
+            labels[i] = best
+
+        self.unsaved += len(vectors)
+        self._since_consolidation += len(vectors)
+        if self._since_consolidation >= self.consolidate_every:
+            self.consolidate()
+        return labels
+
+    def find(self, cluster_id: int) -> int:
+        """The live cluster that `cluster_id` was merged into, or itself."""
+        root = cluster_id
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[cluster_id] != root:
+            self._parent[cluster_id], cluster_id = root, self._parent[cluster_id]
+        return root
+
+    def title(self, cluster_id: int) -> str | None:
+        return self.titles[self.find(cluster_id)]
+
+    def set_title(self, cluster_id: int, title: str) -> str:
+        """Name a cluster unless it already has a name; returns the name it ends up with."""
+        root = self.find(cluster_id)
+        if self.titles[root] is None:
+            self.titles[root] = title
+        return self.titles[root]  # type: ignore
+
+    def consolidate(self) -> List[Tuple[int, int]]:
+        """Merge live clusters whose centroids are within `merge_threshold`; returns (kept, merged) pairs."""
+        self._since_consolidation = 0
+        live = np.flatnonzero(self.counts[:self._size])
+        if len(live) < 2:
+            return []
+
+        # Score centroid pairs a block of rows at a time so memory stays bounded
+        candidates = []
+        centroids = self.centroids[live]
+        for start in range(0, len(live), self.block_size):
+            similarities = centroids[start:start + self.block_size] @ centroids.T
+            rows, columns = np.nonzero(similarities >= self.merge_threshold)
+            rows += start
+            upper = columns > rows
+            candidates.extend(zip(similarities[rows[upper] - start, columns[upper]],
+                                  live[rows[upper]], live[columns[upper]]))
+
+        merged = []
+        touched = set()
+        for _, a, b in sorted(candidates, reverse=True):
+            if a in touched or b in touched:
+                continue
+            keep, absorb = (a, b) if self.counts[a] >= self.counts[b] else (b, a)
+            self._merge(int(keep), int(absorb))
+            touched.update((a, b))
+            merged.append((int(keep), int(absorb)))
+        if merged:
+            logger.info("Consolidated %d cluster pairs, %d clusters remain", len(merged), len(self))
+        return merged
+
+    def _merge(self, keep: int, absorb: int):
+        self.sums[keep] += self.sums[absorb]
+        self.counts[keep] += self.counts[absorb]
+        self.centroids[keep] = TopicMatrix.normalize(self.sums[keep])[0]
+        self.sums[absorb] = 0
+        self.centroids[absorb] = 0
+        self.counts[absorb] = 0
+        self.titles[keep] = self.titles[keep] or self.titles[absorb]
+        self._parent[absorb] = keep
+
+    @property
+    def signature(self) -> str:
+        return self.reducer.signature() if self.reducer else "none"
+
+    def save(self, path: str):
+        save_snapshot(path, sums=self.sums[:self._size], counts=self.counts[:self._size],
+                      titles=np.array(self.titles, dtype=object),
+                      parent=np.array(self._parent, dtype=np.int64), signature=self.signature)
+        self.unsaved = 0
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        snapshot = load_snapshot(path)
+        clusterer = cls(**kwargs)
+        if snapshot is None:
+            return clusterer
+        signature = str(snapshot["signature"]) if "signature" in snapshot else "none"
+        if signature != clusterer.signature:
+            logger.warning("Ignoring cluster snapshot %s built for %s, clusterer uses %s",
+                           path, signature, clusterer.signature)
+            return clusterer
+        size = len(snapshot["counts"])
+        if size:
+            clusterer.sums = snapshot["sums"].astype(np.float32)
+            clusterer.counts = snapshot["counts"]
+            clusterer.centroids = TopicMatrix.normalize(clusterer.sums)
+            clusterer.centroids[clusterer.counts == 0] = 0
+        clusterer.titles = snapshot["titles"].tolist()
+        clusterer._parent = snapshot["parent"].tolist()
+        clusterer._size = size
+        return clusterer
@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering, MiniBatchKMeans
+from sklearn.neighbors import kneighbors_graph
+
+from src.azure import azure_client
+from src.db.db_client import session_scope
+from src.db.db_models import FeatureRequest
+from src.topics.reduction import create_reducer
+from src.topics.topic_matrix import TopicMatrix
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _timed(stages: Dict[str, float], name: str):
+    start = time.perf_counter()
+    yield
+    stages[name] = round(time.perf_counter() - start, 3)
+
+
+def load_feature_requests(batch_size: int = 10000) -> tuple[List[str], List[str]]:
+    """All stored (description, title) pairs, streamed from the table in batches."""
+    descriptions, titles = [], []
+    with session_scope() as db:
+        rows = db.query(FeatureRequest.description, FeatureRequest.title).yield_per(batch_size)
+        for description, title in rows:
+            descriptions.append(description)
+            titles.append(title)
+    return descriptions, titles
+
+
+def load_embeddings(descriptions: List[str], embed_missing: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Normalized float32 embeddings of `descriptions` from the embedding cache.
+    Descriptions with no cached embedding are embedded now, or dropped when
+    `embed_missing` is off; returns the matrix and a mask of the kept rows.
+    """
+    matrix, missing = azure_client.embedding_cache.get_matrix(descriptions)
+    keep = np.ones(len(descriptions), dtype=bool)
+    if missing and embed_missing:
+        logger.info("Embedding %d feature requests missing from the cache", len(missing))
+        embeddings = asyncio.run(azure_client.get_embeddings([descriptions[i] for i in missing]))
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not matrix.shape[1]:
+            matrix = np.zeros((len(descriptions), embeddings.shape[1]), dtype=np.float32)
+        matrix[missing] = embeddings
+    elif missing:
+        logger.info("Skipping %d feature requests missing from the cache", len(missing))
+        keep[missing] = False
+    return TopicMatrix.normalize(matrix[keep]), keep
+
+
+def cluster_minibatch(vectors: np.ndarray, n_clusters: int, batch_size: int = 4096,
+                      seed: int = 0) -> np.ndarray:
+    """Mini-batch k-means: memory and time per pass are linear in the number of vectors."""
+    model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init=3,
+                            random_state=seed)
+    return model.fit_predict(vectors)
+
+
+def cluster_knn(vectors: np.ndarray, n_neighbors: int = 15,
+                distance_threshold: float = 0.6) -> np.ndarray:
+    """
+    Ward agglomerative clustering restricted to a sparse k-nearest-neighbour
+    graph, so merges are only considered between neighbours instead of across
+    the full N x N distance matrix.
+    """
+    connectivity = kneighbors_graph(vectors, n_neighbors=min(n_neighbors, len(vectors) - 1),
+                                    include_self=False, n_jobs=-1)
+    model = AgglomerativeClustering(n_clusters=None, linkage="ward",
+                                    connectivity=connectivity,
+                                    distance_threshold=distance_threshold)
+    return model.fit_predict(vectors)
+
+
+def propose_changes(titles: List[str], descriptions: List[str], labels: np.ndarray,
+                    min_share: float = 0.6, min_split_size: int = 3,
+                    samples: int = 3) -> dict:
+    """
+    Compare stored topics with the new clusters. Topics that mostly land in the
+    same cluster are proposed for a merge into the largest of them; a topic whose
+    requests are spread over several sizeable clusters is proposed for a split.
+    """
+    by_topic: Dict[str, Counter] = defaultdict(Counter)
+    members: Dict[tuple, List[str]] = defaultdict(list)
+    for title, description, label in zip(titles, descriptions, labels):
+        by_topic[title][label] += 1
+        if len(members[title, label]) < samples:
+            members[title, label].append(description)
+
+    dominant: Dict[int, List[str]] = defaultdict(list)
+    splits = []
+    for title, clusters in by_topic.items():
+        total = sum(clusters.values())
+        label, count = clusters.most_common(1)[0]
+        if count / total >= min_share:
+            dominant[label].append(title)
+            continue
+        parts = [{"cluster": int(label), "size": size, "samples": members[title, label]}
+                 for label, size in clusters.most_common() if size >= min_split_size]
+        if len(parts) >= 2:
+            splits.append({"topic": title, "size": total, "parts": parts})
+
+    merges = []
+    for label, topics in dominant.items():
+        if len(topics) < 2:
+            continue
+        topics.sort(key=lambda title: -sum(by_topic[title].values()))
+        merges.append({"into": topics[0], "topics": topics[1:], "cluster": int(label),
+                       "size": sum(sum(by_topic[title].values()) for title in topics)})
+    merges.sort(key=lambda merge: -merge["size"])
+    splits.sort(key=lambda split: -split["size"])
+    return {"merges": merges, "splits": splits}
+
+
+def recluster(algorithm: str = "minibatch", n_clusters: int | None = None,
+              embed_missing: bool = True, reducer=None, **options) -> dict:
+    """
+    Re-cluster every stored feature request and return proposals with runtime and
+    memory figures. A `reducer` projects the embeddings to fewer dimensions first.
+    """
+    stages: Dict[str, float] = {}
+    with _timed(stages, "load"):
+        descriptions, titles = load_feature_requests()
+    with _timed(stages, "embeddings"):
+        vectors, keep = load_embeddings(descriptions, embed_missing)
+        if reducer:
+            vectors = reducer.project(vectors)
+    descriptions = [d for d, kept in zip(descriptions, keep) if kept]
+    titles = [t for t, kept in zip(titles, keep) if kept]
+    if len(vectors) < 2:
+        return {"feature_requests": len(vectors), "merges": [], "splits": []}
+
+    n_topics = len(set(titles))
+    with _timed(stages, "cluster"):
+        if algorithm == "minibatch":
+            labels = cluster_minibatch(vectors, min(n_clusters or n_topics, len(vectors)),
+                                       **options)
+        elif algorithm == "knn":
+            labels = cluster_knn(vectors, **options)
+        else:
+            raise ValueError(f"Unknown clustering algorithm: {algorithm}")
+    with _timed(stages, "proposals"):
+        proposals = propose_changes(titles, descriptions, labels)
+
+    return {
+        "algorithm": algorithm,
+        "reduction": reducer.signature() if reducer else "none",
+        "feature_requests": len(vectors),
+        "topics": n_topics,
+        "clusters": int(len(np.unique(labels))),
+        "runtime_seconds": stages,
+        "memory": {
+            "embeddings_mb": round(vectors.nbytes / 2 ** 20, 1),
+            # ru_maxrss is reported in kilobytes on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        **proposals,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-cluster all stored feature requests and propose topic merges and splits.")
+    parser.add_argument("--algorithm", choices=["minibatch", "knn"], default="minibatch")
+    parser.add_argument("--clusters", type=int,
+                        help="Number of clusters for minibatch, defaults to the current topic count")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--neighbors", type=int, default=15)
+    parser.add_argument("--distance-threshold", type=float, default=0.6)
+    parser.add_argument("--cached-only", action="store_true",
+                        help="Skip feature requests without a cached embedding instead of embedding them")
+    parser.add_argument("--reduce", action="store_true",
+                        help="Project embeddings with the EMBEDDING_REDUCTION reducer before clustering")
+    parser.add_argument("--output", help="Write the report to this JSON file instead of stdout")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.algorithm == "minibatch":
+        options = {"batch_size": args.batch_size}
+    else:
+        options = {"n_neighbors": args.neighbors, "distance_threshold": args.distance_threshold}
+    reducer = create_reducer() if args.reduce else None
+    report = recluster(args.algorithm, args.clusters, not args.cached_only, reducer, **options)
+    logger.info("Re-clustered %d feature requests into %d clusters in %s: %d merges, %d splits",
+                report["feature_requests"], report.get("clusters", 0),
+                report.get("runtime_seconds"), len(report["merges"]), len(report["splits"]))
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
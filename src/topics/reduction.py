@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import logging
+import os
+import time
+
+import numpy as np
+
+from src.db.db_client import session_scope
+from src.db.db_models import Embedding, Topic
+from src.topics.topic_matrix import TopicMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingReducer:
+    """
+    Projects unit embeddings to `dims` dimensions before similarity search and
+    clustering, either with a seeded Gaussian random projection (no fitting
+    needed) or with PCA fitted on a sample of stored embeddings. Projected
+    vectors are re-normalized so dot products stay cosine similarities. With
+    `quantize`, `encode` also packs each vector into int8 codes plus one
+    float32 scale, a quarter of the float32 size.
+    """
+
+    def __init__(self, method: str = "random", dims: int = 256, quantize: bool = False,
+                 seed: int = 0):
+        if method not in ("random", "pca"):
+            raise ValueError(f"Unknown reduction method: {method}")
+        self.method = method
+        self.dims = dims
+        self.quantize = quantize
+        self.seed = seed
+        self.components: np.ndarray | None = None
+        self.mean: np.ndarray | None = None
+
+    def fit(self, vectors, sample_size: int = 20000):
+        vectors = TopicMatrix.normalize(vectors)
+        rng = np.random.default_rng(self.seed)
+        if self.method == "random":
+            self.components = (rng.standard_normal((vectors.shape[1], self.dims)) /
+                               np.sqrt(self.dims)).astype(np.float32)
+            self.mean = np.zeros(vectors.shape[1], dtype=np.float32)
+            return self
+
+        if len(vectors) > sample_size:
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        if len(vectors) < self.dims:
+            raise ValueError(f"PCA to {self.dims} dimensions needs at least {self.dims} vectors, "
+                             f"got {len(vectors)}")
+        self.mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:self.dims].T, dtype=np.float32)
+        return self
+
+    def project(self, vectors) -> np.ndarray:
+        """Reduced, L2-normalized float32 copies of `vectors`."""
+        vectors = TopicMatrix.normalize(vectors)
+        if self.components is None:
+            if self.method != "random":
+                raise RuntimeError("PCA reducer must be fitted before use")
+            self.fit(vectors[:1])
+        return TopicMatrix.normalize((vectors - self.mean) @ self.components)
+
+    def encode(self, vectors) -> tuple[np.ndarray, np.ndarray | None]:
+        """Rows to store: projected float32 rows, or int8 codes and per-row scales."""
+        rows = self.project(vectors)
+        if not self.quantize:
+            return rows, None
+        scales = np.abs(rows).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        codes = np.round(rows / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def signature(self) -> str:
+        """Identifies the stored representation, so snapshots from another setup are not mixed in."""
+        signature = f"{self.method}-{self.dims}-{'int8' if self.quantize else 'f32'}-{self.seed}"
+        if self.method == "pca" and self.components is not None:
+            signature += "-" + hashlib.sha256(self.components.tobytes()).hexdigest()[:12]
+        return signature
+
+    def save(self, path: str):
+        np.savez(path, method=self.method, dims=self.dims, seed=self.seed,
+                 components=self.components, mean=self.mean)
+
+    @classmethod
+    def load(cls, path: str, quantize: bool = False):
+        snapshot = np.load(path)
+        reducer = cls(str(snapshot["method"]), int(snapshot["dims"]), quantize,
+                      int(snapshot["seed"]))
+        reducer.components = snapshot["components"]
+        reducer.mean = snapshot["mean"]
+        return reducer
+
+
+def create_reducer() -> EmbeddingReducer | None:
+    """
+    Reducer configured by EMBEDDING_REDUCTION (none, random or pca),
+    EMBEDDING_REDUCED_DIMS and EMBEDDING_QUANTIZE. PCA loads the components
+    fitted by `python -m src.topics.reduction fit` from EMBEDDING_REDUCER_PATH.
+    """
+    method = os.getenv("EMBEDDING_REDUCTION", "none")
+    if method == "none":
+        return None
+    quantize = os.getenv("EMBEDDING_QUANTIZE", "false").lower() == "true"
+    if method == "pca":
+        path = os.getenv("EMBEDDING_REDUCER_PATH")
+        if not path or not os.path.exists(path):
+            raise ValueError("EMBEDDING_REDUCTION=pca needs a fitted reducer at EMBEDDING_REDUCER_PATH")
+        return EmbeddingReducer.load(path, quantize)
+    return EmbeddingReducer(method, int(os.getenv("EMBEDDING_REDUCED_DIMS", "256")), quantize)
+
+
+def compare_assignments(topics: np.ndarray, queries: np.ndarray, reducer: EmbeddingReducer,
+                        threshold: float = 0.7) -> dict:
+    """Assign `queries` to `topics` with full and with reduced vectors and report how much changes."""
+    titles = [str(i) for i in range(len(topics))]
+    full, reduced = TopicMatrix(), TopicMatrix(reducer=reducer)
+    full.add(titles, topics)
+    reduced.add(titles, topics)
+
+    timings = {}
+    results = {}
+    for name, index in (("full", full), ("reduced", reduced)):
+        start = time.perf_counter()
+        results[name] = index.search(queries, k=1)
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    (full_top, full_scores), (reduced_top, reduced_scores) = results["full"], results["reduced"]
+    full_assigned = np.where(full_scores[:, 0] >= threshold, full_top[:, 0], -1)
+    reduced_assigned = np.where(reduced_scores[:, 0] >= threshold, reduced_top[:, 0], -1)
+    return {
+        "signature": reducer.signature(),
+        "topics": len(topics),
+        "queries": len(queries),
+        "top1_agreement": round(float(np.mean(full_top[:, 0] == reduced_top[:, 0])), 4),
+        "assignment_agreement": round(float(np.mean(full_assigned == reduced_assigned)), 4),
+        "mean_similarity_error": round(float(np.mean(np.abs(full_scores - reduced_scores))), 4),
+        "matrix_bytes": {"full": full.nbytes, "reduced": reduced.nbytes},
+        "search_ms": timings,
+    }
+
+
+def _load_stored_embeddings(limit: int) -> np.ndarray:
+    with session_scope() as db:
+        rows = db.query(Embedding.vector).limit(limit).all()
+    return np.stack([np.frombuffer(vector, dtype=np.float32) for (vector,) in rows])
+
+
+def load_topic_embeddings() -> np.ndarray:
+    """Raw float32 title embeddings of every stored topic."""
+    with session_scope() as db:
+        rows = db.query(Topic.embedding).filter(Topic.embedding.isnot(None)).all()
+    return np.stack([TopicMatrix.decode(embedding) for (embedding,) in rows])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fit an embedding reducer, or compare topic assignments with and without one.")
+    parser.add_argument("command", choices=["fit", "evaluate"])
+    parser.add_argument("--method", choices=["random", "pca"], default="pca")
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--reducer", help="Fitted reducer (.npz) to evaluate instead of fitting one")
+    parser.add_argument("--sample", type=int, default=50000,
+                        help="Stored embeddings to fit on and to evaluate as queries")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--output", default="reducer.npz")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    embeddings = _load_stored_embeddings(args.sample)
+    if args.reducer:
+        reducer = EmbeddingReducer.load(args.reducer, args.quantize)
+    else:
+        reducer = EmbeddingReducer(args.method, args.dims, args.quantize).fit(embeddings)
+
+    if args.command == "fit":
+        reducer.save(args.output)
+        print(f"{reducer.signature()} fitted on {len(embeddings)} embeddings, saved to {args.output}")
+        return
+
+    for key, value in compare_assignments(load_topic_embeddings(), embeddings, reducer,
+                                          args.threshold).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
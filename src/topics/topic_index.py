@@ -0,0 +1,146 @@
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+from src.topics.reduction import create_reducer, load_topic_embeddings
+from src.topics.topic_matrix import TopicMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class IVFTopicIndex(TopicMatrix):
+    """
+    Inverted-file approximate index over the topic matrix. Topics are bucketed
+    under spherical k-means centroids and a query only scores the topics in its
+    `nprobe` closest buckets. Below `min_train_size` topics it searches exactly.
+    """
+
+    def __init__(self, nprobe: int = 8, min_train_size: int = 2000, seed: int = 0, reducer=None):
+        super().__init__(reducer)
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self.centroids: np.ndarray | None = None
+        self.lists: list = []
+        self._trained_size = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, iterations: int = 10, sample_size: int = 20000):
+        rng = np.random.default_rng(self.seed)
+        n_lists = max(1, int(4 * np.sqrt(len(self))))
+        sample = self.matrix
+        if len(sample) > sample_size:
+            sample = sample[rng.choice(len(sample), sample_size, replace=False)]
+        sample = self.normalize(sample)
+        n_lists = min(n_lists, len(sample))
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = self.normalize(sums)
+
+        self.centroids = centroids
+        self.lists = [[] for _ in range(n_lists)]
+        self._assign_to_lists(0, self.matrix)
+        self._trained_size = len(self)
+        logger.info("IVF topic index trained with %d lists over %d topics",
+                    n_lists, len(self))
+
+    def _assign_to_lists(self, offset: int, rows: np.ndarray):
+        labels = np.argmax(rows @ self.centroids.T, axis=1)  # type: ignore
+        for position, label in enumerate(labels, start=offset):
+            self.lists[label].append(position)
+
+    def _on_add(self, rows: np.ndarray):
+        if self.trained and len(self) < 2 * self._trained_size:
+            self._assign_to_lists(len(self) - len(rows), rows)
+        elif len(self) >= self.min_train_size:
+            # Retrain once the catalog has doubled so list sizes stay balanced
+            self.train()
+
+    def search(self, queries, k: int = 1):
+        if not self.trained:
+            return super().search(queries, k)
+
+        queries = self.project(queries)
+        k = min(k, len(self.titles))
+        nprobe = min(self.nprobe, len(self.lists))
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]  # type: ignore
+        indices = np.zeros((len(queries), k), dtype=np.int64)
+        scores = np.full((len(queries), k), -1.0, dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.fromiter(
+                (p for label in lists for p in self.lists[label]), dtype=np.int64)
+            if not len(candidates):
+                continue
+            similarities = self.similarities(query[None, :], candidates)[0]
+            top = np.argsort(-similarities)[:k]
+            indices[row, :len(top)] = candidates[top]
+            scores[row, :len(top)] = similarities[top]
+        return indices, scores
+
+
+def create_topic_index(kind: str | None = None) -> TopicMatrix:
+    """Build the topic index configured by TOPIC_INDEX (exact or ivf) and the EMBEDDING_REDUCTION settings."""
+    kind = kind or os.getenv("TOPIC_INDEX", "exact")
+    reducer = create_reducer()
+    if kind == "ivf":
+        return IVFTopicIndex(nprobe=int(os.getenv("TOPIC_INDEX_NPROBE", "8")), reducer=reducer)
+    if kind == "exact":
+        return TopicMatrix(reducer)
+    raise ValueError(f"Unknown topic index type: {kind}")
+
+
+def measure_recall(index: TopicMatrix, queries, k: int = 1) -> float:
+    """Fraction of the exact top-k topics that `index` also returns."""
+    expected, _ = TopicMatrix.search(index, queries, k)
+    actual, _ = index.search(queries, k)
+    hits = sum(len(set(e) & set(a)) for e, a in zip(expected, actual))
+    return hits / expected.size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report recall and latency of the IVF topic index against exact search.")
+    parser.add_argument("snapshot", help="Topic index snapshot (.npz) to evaluate")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("-k", type=int, default=1)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    # The snapshot holds projected rows, so load it with the reducer it was written with
+    # and query with raw title embeddings, as the call processor does
+    index = IVFTopicIndex.load(args.snapshot, min_train_size=0, reducer=create_reducer())
+    if not len(index):
+        parser.error(f"{args.snapshot} is empty or was built with a different EMBEDDING_REDUCTION")
+    embeddings = load_topic_embeddings()
+    rng = np.random.default_rng(0)
+    queries = embeddings[rng.choice(len(embeddings), min(args.queries, len(embeddings)), replace=False)]
+    queries = queries + rng.normal(scale=args.noise, size=queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    TopicMatrix.search(index, queries, args.k)
+    exact_ms = (time.perf_counter() - start) * 1000
+    print(f"exact: {len(index)} topics, {exact_ms:.1f} ms for {len(queries)} queries")
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        start = time.perf_counter()
+        index.search(queries, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"ivf nprobe={nprobe}: recall@{args.k}={measure_recall(index, queries, args.k):.3f}, "
+              f"{elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
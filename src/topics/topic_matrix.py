@@ -0,0 +1,185 @@
+import logging
+import os
+import tempfile
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def save_snapshot(path: str, **arrays):
+    """
+    Write `arrays` to exactly `path` (np.savez appends .npz to a bare name)
+    through a temporary file in the same directory, so a crash mid-write
+    leaves the previous snapshot in place rather than a truncated one.
+    """
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def load_snapshot(path: str) -> dict | None:
+    """Every array in a snapshot, or None with a warning when it can't be read."""
+    try:
+        with np.load(path, allow_pickle=True) as snapshot:
+            return {name: snapshot[name] for name in snapshot.files}
+    except Exception as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+
+
+class TopicMatrix:
+    """
+    Topic titles with their embeddings stacked into one L2-normalized float32
+    matrix, so cosine similarity against every topic is a single matrix multiply.
+    With a `reducer` (see src/topics/reduction.py) rows and queries are projected
+    to fewer dimensions first, and rows may be stored as int8 codes with a
+    float32 scale each.
+    """
+
+    # Rows scored per block when int8 codes have to be widened for the multiply
+    block_size = 16384
+
+    def __init__(self, reducer=None):
+        self.reducer = reducer
+        self.titles: List[str] = []
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.scales: np.ndarray | None = None
+        self._positions: dict = {}
+        # Topics added since the last snapshot was written
+        self.unsaved = 0
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __contains__(self, title: str):
+        return title in self._positions
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @property
+    def signature(self) -> str:
+        return self.reducer.signature() if self.reducer else "none"
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def encode(embedding) -> bytes:
+        return np.asarray(embedding, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def decode(data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype=np.float32)
+
+    def project(self, queries) -> np.ndarray:
+        """Queries in the space the rows are stored in."""
+        return self.reducer.project(queries) if self.reducer else self.normalize(queries)
+
+    def add(self, titles: Iterable[str], embeddings):
+        """Append new topics; titles that are already present are ignored."""
+        new_titles = []
+        new_rows = []
+        for title, embedding in zip(titles, embeddings):
+            if title in self._positions:
+                continue
+            self._positions[title] = len(self.titles) + len(new_titles)
+            new_titles.append(title)
+            new_rows.append(embedding)
+        if not new_titles:
+            return
+
+        if self.reducer:
+            rows, scales = self.reducer.encode(new_rows)
+        else:
+            rows, scales = self.normalize(new_rows), None
+        self._append(new_titles, rows, scales)
+
+    def _append(self, titles: List[str], rows: np.ndarray, scales: np.ndarray | None):
+        if not len(self.titles):
+            self.matrix, self.scales = rows, scales
+        else:
+            self.matrix = np.vstack([self.matrix, rows])
+            if scales is not None:
+                self.scales = np.concatenate([self.scales, scales])  # type: ignore
+        for position, title in enumerate(titles, start=len(self.titles)):
+            self._positions[title] = position
+        self.titles.extend(titles)
+        self.unsaved += len(titles)
+        self._on_add(rows)
+
+    def _on_add(self, rows: np.ndarray):
+        """Hook for subclasses that maintain extra structures over the matrix."""
+
+    def save(self, path: str):
+        snapshot = {"titles": np.array(self.titles, dtype=object), "matrix": self.matrix,
+                    "signature": self.signature}
+        if self.scales is not None:
+            snapshot["scales"] = self.scales
+        save_snapshot(path, **snapshot)
+        self.unsaved = 0
+
+    def restore(self, path: str):
+        """Fill an empty index from a snapshot written with the same reducer setup."""
+        snapshot = load_snapshot(path)
+        if snapshot is None:
+            return self
+        signature = str(snapshot["signature"]) if "signature" in snapshot else "none"
+        if signature != self.signature:
+            logger.warning("Ignoring topic snapshot %s built for %s, index uses %s",
+                           path, signature, self.signature)
+            return self
+        if len(snapshot["titles"]):
+            self._append(snapshot["titles"].tolist(), snapshot["matrix"],
+                         snapshot["scales"] if "scales" in snapshot else None)
+        self.unsaved = 0
+        return self
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        return cls(**kwargs).restore(path)
+
+    def similarities(self, queries: np.ndarray, rows=None) -> np.ndarray:
+        """Cosine similarity of projected `queries` to every topic, or to the `rows` given."""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if self.scales is None:
+            return queries @ matrix.T
+        scales = self.scales if rows is None else self.scales[rows]
+        similarities = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), self.block_size):
+            block = matrix[start:start + self.block_size].astype(np.float32)
+            similarities[:, start:start + len(block)] = (
+                queries @ block.T) * scales[start:start + len(block)]
+        return similarities
+
+    def search(self, queries, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the indices and cosine similarities of the k closest topics per query."""
+        similarities = self.similarities(self.project(queries))
+        k = min(k, len(self.titles))
+        if k == 1:
+            indices = np.argmax(similarities, axis=1)[:, None]
+        else:
+            indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(similarities, indices, axis=1), axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+        return indices, np.take_along_axis(similarities, indices, axis=1)
+
+    def assign(self, queries, threshold: float) -> np.ndarray:
+        """Index of the closest topic for each query, or -1 when it is below `threshold`."""
+        if not len(self.titles) or not len(queries):
+            return np.full(len(queries), -1)
+        indices, scores = self.search(queries, k=1)
+        return np.where(scores[:, 0] >= threshold, indices[:, 0], -1)
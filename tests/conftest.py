@@ -0,0 +1,8 @@
+import numpy as np
+
+
+def vector(*components: float, dims: int = 8) -> np.ndarray:
+    """A float32 vector with the given leading components and zeros after them."""
+    result = np.zeros(dims, dtype=np.float32)
+    result[:len(components)] = components
+    return result
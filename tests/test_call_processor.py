@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.azure.azure_client import FeatureRequestGroup
+from src.processing import call_processor
+from src.topics.topic_matrix import TopicMatrix
+
+
+def test_regrouped_duplicates_join_the_single_clustered_event(monkeypatch):
+    extracted = ["SSO with Okta", "Export to CSV", "CSV export please"]
+    passes = []
+
+    async def extract_feature_requests(transcripts, use_cache=True):
+        return extracted
+
+    async def find_duplicates(db, feature_requests, customer_name):
+        return np.zeros((3, 4)), {"CSV export please": "Export to CSV"}, [], {}
+
+    async def process_feature_requests(feature_requests, on_event=None, **kwargs):
+        passes.append(feature_requests)
+        if len(passes) == 1:
+            # The canonical request lands in a cluster whose title could not be generated
+            on_event("assigned", {"groups": [{"title": "SSO", "feature_requests": ["SSO with Okta"]}],
+                                  "unassigned": 1})
+            on_event("clustered", {"groups": [{"title": None, "feature_requests": ["Export to CSV"]}]})
+            return [FeatureRequestGroup("SSO", ["SSO with Okta"]),
+                    FeatureRequestGroup(None, ["Export to CSV"])]
+        assert on_event is None
+        return [FeatureRequestGroup("CSV export", list(feature_requests))]
+
+    async def get_embeddings(texts):
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+    async def sync_topic_matrix(db):
+        pass
+
+    monkeypatch.setattr(call_processor.azure_client, "extract_feature_requests", extract_feature_requests)
+    monkeypatch.setattr(call_processor.azure_client, "process_feature_requests", process_feature_requests)
+    monkeypatch.setattr(call_processor.azure_client, "get_embeddings", get_embeddings)
+    monkeypatch.setattr(call_processor, "_find_duplicates", find_duplicates)
+    monkeypatch.setattr(call_processor, "_sync_topic_matrix", sync_topic_matrix)
+    monkeypatch.setattr(call_processor, "_store_results", lambda *args: [])
+    monkeypatch.setattr(call_processor, "topic_matrix", TopicMatrix())
+    monkeypatch.setattr(call_processor.request_index, "add", lambda *args: None)
+
+    events = []
+    call = SimpleNamespace(id="1", customer_name="Acme", started=None)
+    asyncio.run(call_processor.process_call({}, call, None,
+                                            on_event=lambda name, data: events.append((name, data))))
+
+    assert passes == [["SSO with Okta", "Export to CSV"], ["CSV export please"]]
+    assert [name for name, _ in events] == ["extracted", "deduplicated", "assigned", "clustered", "stored"]
+    assert dict(events)["clustered"]["groups"] == [
+        {"title": None, "feature_requests": ["Export to CSV"]},
+        {"title": "CSV export", "feature_requests": ["CSV export please"]}]
+
+
+def test_request_repeated_from_another_customer_is_not_its_own_duplicate(monkeypatch):
+    async def get_embeddings(texts):
+        return np.eye(len(texts), 4, dtype=np.float32)
+
+    # Another customer stored both requests; the second was linked to an earlier one
+    exact = {"SSO with Okta": None, "Okta SSO support": "Single sign-on"}
+    titles = {"SSO with Okta": "SSO", "Single sign-on": "SSO"}
+    monkeypatch.setattr(call_processor.azure_client, "get_embeddings", get_embeddings)
+    monkeypatch.setattr(call_processor, "_load_exact_duplicates", lambda db, descriptions, customer: exact)
+    monkeypatch.setattr(call_processor, "_load_request_titles",
+                        lambda db, descriptions: {d: titles[d] for d in descriptions if d in titles})
+    monkeypatch.setattr(call_processor, "request_index", call_processor.NearDuplicateIndex(threshold=0.92))
+
+    _, duplicates, repeated, canonical_titles = asyncio.run(call_processor._find_duplicates(
+        None, ["SSO with Okta", "Okta SSO support", "CSV export"], "Acme"))
+
+    assert duplicates == {"Okta SSO support": "Single sign-on"}
+    assert repeated == ["SSO with Okta"]
+    assert canonical_titles == titles
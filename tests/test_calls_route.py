@@ -0,0 +1,29 @@
+import base64
+
+import pytest
+
+from sqlalchemy.dialects import postgresql
+
+from src.routes.calls_route import ProcessedFilters, _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    assert _decode_cursor(_encode_cursor(12, "SSO / Okta ✓")) == (12, "SSO / Okta ✓")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b"[1, 2, 3]").decode(),
+    base64.urlsafe_b64encode(b"7").decode(),
+])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        _decode_cursor(cursor)
+
+
+def test_topic_filter_matches_wildcards_literally():
+    (clause,) = ProcessedFilters(None, None, None, None, "50%_off").clauses()
+    compiled = clause.compile(dialect=postgresql.dialect())
+    assert "ESCAPE '/'" in str(compiled)
+    assert "50/%/_off" in compiled.params.values()
@@ -0,0 +1,61 @@
+from conftest import vector
+from src.topics.dedup import NearDuplicateIndex
+
+
+SSO = vector(1.0)
+SSO_REPHRASED = vector(1.0, 0.1)
+SSO_AGAIN = vector(1.0, 0.05)
+EXPORT = vector(0.0, 0.0, 1.0)
+
+
+def _index() -> NearDuplicateIndex:
+    index = NearDuplicateIndex(threshold=0.92)
+    index.add(["SSO with Okta", "Okta SSO support"], [SSO, SSO_REPHRASED],
+              {"Okta SSO support": "SSO with Okta"})
+    return index
+
+
+def test_new_rephrasing_links_to_the_canonical_request():
+    assert _index().match(["Support Okta single sign-on"], [SSO_AGAIN]) == {
+        "Support Okta single sign-on": "SSO with Okta"}
+
+
+def test_unrelated_request_is_not_linked():
+    assert _index().match(["CSV export"], [EXPORT]) == {}
+
+
+def test_reprocessed_duplicate_keeps_its_link():
+    assert _index().match(["Okta SSO support"], [SSO_REPHRASED]) == {
+        "Okta SSO support": "SSO with Okta"}
+
+
+def test_reprocessed_canonical_request_does_not_link_to_itself():
+    assert _index().match(["SSO with Okta"], [SSO]) == {}
+
+
+def test_reprocessed_batch_in_any_order_does_not_link_to_itself():
+    index = _index()
+    assert index.match(["Okta SSO support", "SSO with Okta"], [SSO_REPHRASED, SSO]) == {
+        "Okta SSO support": "SSO with Okta"}
+
+
+def test_duplicates_within_a_batch_link_to_the_first_one():
+    index = NearDuplicateIndex(threshold=0.92)
+    assert index.match(["SSO with Okta", "CSV export", "Okta SSO support"],
+                       [SSO, EXPORT, SSO_REPHRASED]) == {"Okta SSO support": "SSO with Okta"}
+
+
+def test_duplicates_of_an_untitled_request_are_returned_for_grouping():
+    from src.azure.azure_client import FeatureRequestGroup
+    from src.processing.call_processor import _file_duplicates
+
+    groups = [FeatureRequestGroup("SSO", ["SSO with Okta"]), FeatureRequestGroup(None, ["CSV export"])]
+    unfiled = _file_duplicates(groups, {"Okta SSO support": "SSO with Okta",
+                                        "Export to CSV": "CSV export",
+                                        "Slack alerts please": "Slack alerts"},
+                               {"Slack alerts": "Notifications"})
+    assert unfiled == ["Export to CSV"]
+    assert {group.title: group.feature_requests for group in groups} == {
+        "SSO": ["SSO with Okta", "Okta SSO support"],
+        None: ["CSV export"],
+        "Notifications": ["Slack alerts please"]}
@@ -0,0 +1,27 @@
+import asyncio
+from datetime import timedelta
+
+from src.jobs.job_queue import CallJobQueue
+
+
+def _submit_empty_jobs(queue: CallJobQueue, count: int) -> list:
+    async def submit():
+        try:
+            return [queue.submit([]).id for _ in range(count)]
+        finally:
+            await queue.stop()
+    return asyncio.run(submit())
+
+
+def test_oldest_finished_jobs_are_dropped_beyond_the_limit():
+    queue = CallJobQueue(None, workers=1, max_finished_jobs=2)  # type: ignore
+    job_ids = _submit_empty_jobs(queue, 5)
+    # The limit is enforced before each submit, so the newest job may be one over it
+    assert list(queue.jobs) == job_ids[2:]
+
+
+def test_expired_jobs_are_dropped():
+    queue = CallJobQueue(None, workers=1, job_ttl=timedelta(0))  # type: ignore
+    job_ids = _submit_empty_jobs(queue, 3)
+    assert list(queue.jobs) == job_ids[-1:]
+    assert queue.get(job_ids[0]) is None
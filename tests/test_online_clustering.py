@@ -0,0 +1,47 @@
+from conftest import vector
+from src.topics.online_clustering import OnlineClusterer
+
+
+def test_similar_vectors_share_a_cluster_and_others_open_new_ones():
+    clusterer = OnlineClusterer(threshold=0.9)
+    labels = clusterer.partial_fit([vector(1.0), vector(1.0, 0.1), vector(0, 0, 1.0)])
+    assert labels[0] == labels[1] != labels[2]
+    assert len(clusterer) == 2
+
+
+def test_consolidation_merges_drifted_clusters_and_keeps_ids_valid():
+    clusterer = OnlineClusterer(threshold=0.95, merge_threshold=0.9, consolidate_every=10 ** 6)
+    first, second = clusterer.partial_fit([vector(1.0), vector(1.0, 0.4)])
+    assert first != second
+    clusterer.set_title(second, "SSO")
+
+    assert clusterer.consolidate() == [(first, second)]
+    assert len(clusterer) == 1
+    assert clusterer.find(second) == first
+    assert clusterer.title(second) == "SSO"
+    assert clusterer.set_title(first, "Single sign-on") == "SSO"
+
+
+def test_snapshot_round_trip(tmp_path):
+    clusterer = OnlineClusterer(threshold=0.9)
+    labels = clusterer.partial_fit([vector(1.0), vector(0, 1.0)])
+    clusterer.set_title(labels[0], "SSO")
+    path = str(tmp_path / "clusters.npz")
+    clusterer.save(path)
+
+    restored = OnlineClusterer.load(path, threshold=0.9)
+    assert len(restored) == 2
+    assert restored.title(labels[0]) == "SSO"
+    assert restored.partial_fit([vector(1.0, 0.05)])[0] == labels[0]
+
+
+def test_snapshot_without_suffix_and_unreadable_snapshot(tmp_path):
+    clusterer = OnlineClusterer(threshold=0.9)
+    clusterer.partial_fit([vector(1.0)])
+    path = tmp_path / "clusters"
+    clusterer.save(str(path))
+    assert [p.name for p in tmp_path.iterdir()] == ["clusters"]
+    assert len(OnlineClusterer.load(str(path), threshold=0.9)) == 1
+
+    path.write_bytes(b"not a snapshot")
+    assert len(OnlineClusterer.load(str(path), threshold=0.9)) == 0
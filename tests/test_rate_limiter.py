@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import openai
+import pytest
+
+from src.azure.rate_limiter import DeploymentLimiter, TokenBucket
+
+
+def _limiter(concurrency: int = 8, **kwargs) -> DeploymentLimiter:
+    return DeploymentLimiter("test", rpm=10 ** 6, tpm=10 ** 9, concurrency=concurrency,
+                             max_concurrency=concurrency, **kwargs)
+
+
+def _throttled() -> openai.error.RateLimitError:
+    return openai.error.RateLimitError("throttled", headers={"retry-after-ms": "1"})
+
+
+def test_token_bucket_lets_oversized_request_run_into_debt():
+    async def run():
+        bucket = TokenBucket(capacity=10, rate=1000)
+        await asyncio.wait_for(bucket.acquire(50), timeout=1)
+        return bucket.available
+
+    assert asyncio.run(run()) < 0
+
+
+def test_burst_of_throttled_requests_halves_concurrency_once():
+    async def run():
+        limiter = _limiter(concurrency=8)
+        all_in_flight = asyncio.Event()
+        attempts: dict = {}
+        retried_with = []
+
+        async def request(caller):
+            attempts[caller] = attempts.get(caller, 0) + 1
+            if attempts[caller] > 1:
+                retried_with.append(limiter.concurrency)
+                return caller
+            if len(attempts) == 8:
+                all_in_flight.set()
+            await all_in_flight.wait()
+            raise _throttled()
+
+        results = await asyncio.gather(*(
+            limiter.call(lambda caller=caller: request(caller), tokens=1) for caller in range(8)))
+        return limiter, results, retried_with
+
+    limiter, results, retried_with = asyncio.run(run())
+    assert results == list(range(8))
+    assert min(retried_with) == 4
+    assert limiter.in_flight == 0
+
+
+def test_throttling_after_a_decrease_halves_again():
+    async def run():
+        limiter = _limiter(concurrency=8)
+        responses = iter([_throttled(), _throttled(), "ok"])
+
+        async def request():
+            response = next(responses)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        assert await limiter.call(request, tokens=1) == "ok"
+        return limiter.concurrency
+
+    assert asyncio.run(run()) < 3
+
+
+def test_cancelled_caller_waiting_for_quota_releases_its_slot():
+    async def run():
+        limiter = _limiter(concurrency=1)
+        limiter._paused_until = time.monotonic() + 60
+        waiter = asyncio.create_task(limiter.call(lambda: asyncio.sleep(0), tokens=1))
+        await asyncio.sleep(0.01)
+        assert limiter.in_flight == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return limiter.in_flight
+
+    assert asyncio.run(run()) == 0
+
+
+def test_cancelled_caller_waiting_for_a_slot_does_not_block_others():
+    async def run():
+        limiter = _limiter(concurrency=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(limiter.call(release.wait, tokens=1))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(limiter.call(lambda: asyncio.sleep(0), tokens=1))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        release.set()
+        await holder
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.wait_for(limiter.call(lambda: asyncio.sleep(0, "next"), tokens=1), timeout=1)
+        return limiter.in_flight
+
+    assert asyncio.run(run()) == 0
+
+
+def test_client_errors_are_not_retried():
+    async def run():
+        limiter = _limiter()
+        calls = []
+
+        async def request():
+            calls.append(1)
+            raise openai.error.APIError("bad request", http_status=400)
+
+        with pytest.raises(openai.error.APIError):
+            await limiter.call(request, tokens=1)
+        return len(calls), limiter.in_flight
+
+    assert asyncio.run(run()) == (1, 0)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from src.topics.reduction import EmbeddingReducer
+from src.topics.topic_matrix import TopicMatrix
+
+
+def _embeddings(count: int, dims: int = 64, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dims)).astype(np.float32)
+
+
+def test_projection_is_normalized_and_seeded():
+    embeddings = _embeddings(10)
+    first = EmbeddingReducer("random", dims=16).project(embeddings)
+    assert first.shape == (10, 16)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    assert np.allclose(first, EmbeddingReducer("random", dims=16).project(embeddings))
+
+
+def test_int8_codes_round_trip_within_one_step():
+    reducer = EmbeddingReducer("random", dims=16, quantize=True)
+    codes, scales = reducer.encode(_embeddings(20))
+    assert codes.dtype == np.int8 and scales.dtype == np.float32
+    rows = reducer.project(_embeddings(20))
+    assert np.all(np.abs(codes * scales[:, None] - rows) <= scales[:, None] / 2 + 1e-6)
+
+
+def test_signature_tells_setups_apart():
+    signatures = {EmbeddingReducer("random", 16).signature(),
+                  EmbeddingReducer("random", 32).signature(),
+                  EmbeddingReducer("random", 16, quantize=True).signature(),
+                  EmbeddingReducer("random", 16, seed=1).signature()}
+    assert len(signatures) == 4
+    pca = EmbeddingReducer("pca", 8).fit(_embeddings(50))
+    other = EmbeddingReducer("pca", 8).fit(_embeddings(50, seed=1))
+    assert pca.signature() != other.signature()
+
+
+def test_quantized_block_scoring_matches_float_scoring():
+    embeddings, queries = _embeddings(50), _embeddings(5, seed=1)
+    titles = [str(i) for i in range(50)]
+    reducer = EmbeddingReducer("random", dims=32)
+    exact = TopicMatrix(reducer=reducer)
+    exact.add(titles, embeddings)
+    quantized = TopicMatrix(reducer=EmbeddingReducer("random", dims=32, quantize=True))
+    quantized.block_size = 7
+    quantized.add(titles, embeddings)
+
+    projected = reducer.project(queries)
+    assert np.allclose(quantized.similarities(projected), exact.similarities(projected), atol=0.02)
+    assert np.allclose(quantized.similarities(projected, [3, 9]),
+                       quantized.similarities(projected)[:, [3, 9]])
+
+
+def test_snapshot_from_another_reducer_is_ignored(tmp_path):
+    path = str(tmp_path / "topics.npz")
+    index = TopicMatrix(reducer=EmbeddingReducer("random", dims=16))
+    index.add(["SSO"], _embeddings(1))
+    index.save(path)
+
+    assert len(TopicMatrix(reducer=EmbeddingReducer("random", dims=16)).restore(path)) == 1
+    assert len(TopicMatrix(reducer=EmbeddingReducer("random", dims=32)).restore(path)) == 0
+    assert len(TopicMatrix().restore(path)) == 0
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from src.topics.topic_index import IVFTopicIndex, create_topic_index, measure_recall
+from src.topics.topic_matrix import TopicMatrix
+
+
+def _embeddings(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, 32)).astype(np.float32)
+
+
+def test_small_index_searches_exactly():
+    index = IVFTopicIndex(min_train_size=100)
+    index.add([str(i) for i in range(50)], _embeddings(50))
+    assert not index.trained
+    assert measure_recall(index, _embeddings(20, seed=1), k=3) == 1.0
+
+
+def test_probing_every_list_matches_exact_search():
+    index = IVFTopicIndex(min_train_size=200)
+    index.add([str(i) for i in range(400)], _embeddings(400))
+    assert index.trained
+    index.nprobe = len(index.lists)
+    assert measure_recall(index, _embeddings(50, seed=1), k=5) == 1.0
+
+
+def test_topics_added_after_training_are_searchable():
+    embeddings = _embeddings(300)
+    index = IVFTopicIndex(min_train_size=200)
+    index.add([str(i) for i in range(250)], embeddings[:250])
+    index.add([str(i) for i in range(250, 300)], embeddings[250:])
+    assert sorted(p for bucket in index.lists for p in bucket) == list(range(300))
+    indices, scores = index.search(embeddings[260:270], k=1)
+    assert indices[:, 0].tolist() == list(range(260, 270))
+    assert np.allclose(scores, 1.0, atol=1e-5)
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = IVFTopicIndex(min_train_size=0)
+    index.add(["SSO", "CSV export"], _embeddings(2))
+    path = str(tmp_path / "topics.npz")
+    index.save(path)
+
+    restored = IVFTopicIndex.load(path, min_train_size=0)
+    assert restored.titles == ["SSO", "CSV export"]
+    assert np.allclose(restored.matrix, index.matrix)
+    assert restored.unsaved == 0
+
+
+def test_snapshot_is_written_to_the_exact_path(tmp_path):
+    index = TopicMatrix()
+    index.add(["SSO"], _embeddings(1))
+    path = tmp_path / "topics"
+    index.save(str(path))
+    index.save(str(path))
+
+    assert [p.name for p in tmp_path.iterdir()] == ["topics"]
+    assert TopicMatrix.load(str(path)).titles == ["SSO"]
+
+
+def test_unreadable_snapshot_leaves_the_index_empty(tmp_path):
+    path = tmp_path / "topics.npz"
+    path.write_bytes(b"PK\x03\x04 truncated")
+    assert len(TopicMatrix.load(str(path))) == 0
+
+
+def test_create_topic_index():
+    assert isinstance(create_topic_index("ivf"), IVFTopicIndex)
+    assert type(create_topic_index("exact")) is TopicMatrix
+    with pytest.raises(ValueError):
+        create_topic_index("hnsw")
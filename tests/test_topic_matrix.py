@@ -0,0 +1,40 @@
+import numpy as np
+
+from conftest import vector
+from src.topics.topic_matrix import TopicMatrix
+
+
+def _matrix() -> TopicMatrix:
+    matrix = TopicMatrix()
+    matrix.add(["SSO", "CSV export", "Slack alerts"],
+               [vector(2.0), vector(0, 3.0), vector(0, 0, 1.0)])
+    return matrix
+
+
+def test_rows_are_normalized_and_existing_titles_ignored():
+    matrix = _matrix()
+    matrix.add(["SSO", "Audit log"], [vector(0, 0, 0, 1.0), vector(0, 0, 0, 5.0)])
+    assert matrix.titles == ["SSO", "CSV export", "Slack alerts", "Audit log"]
+    assert np.allclose(np.linalg.norm(matrix.matrix, axis=1), 1.0)
+    assert "Audit log" in matrix and "Webhooks" not in matrix
+
+
+def test_search_orders_the_k_closest_topics_by_similarity():
+    indices, scores = _matrix().search([vector(1.0, 0.5)], k=2)
+    assert indices.tolist() == [[0, 1]]
+    assert scores[0, 0] > scores[0, 1] > 0
+
+
+def test_assign_applies_the_threshold():
+    queries = [vector(1.0, 0.1), vector(0, 0, 1.0), vector(1.0, 1.0, 1.0)]
+    assert _matrix().assign(queries, threshold=0.7).tolist() == [0, 2, -1]
+
+
+def test_assign_without_topics_or_queries():
+    assert TopicMatrix().assign([vector(1.0)], threshold=0.7).tolist() == [-1]
+    assert _matrix().assign(np.empty((0, 8)), threshold=0.7).tolist() == []
+
+
+def test_embedding_bytes_round_trip():
+    embedding = vector(0.25, -1.5, 3.0)
+    assert np.array_equal(TopicMatrix.decode(TopicMatrix.encode(embedding)), embedding)
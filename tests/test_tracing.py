@@ -0,0 +1,31 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from src.telemetry.tracing import LatencyMiddleware
+
+
+def _observed_seconds(route: str) -> float:
+    return REGISTRY.get_sample_value("featbull_http_request_duration_seconds_sum",
+                                     {"method": "GET", "route": route, "status": "200"}) or 0.0
+
+
+def test_streamed_responses_are_timed_to_the_end_of_the_body():
+    app = FastAPI()
+    app.add_middleware(LatencyMiddleware)
+
+    @app.get("/stream/{name}")
+    async def stream(name: str):
+        async def body():
+            yield b"first\n"
+            await asyncio.sleep(0.2)
+            yield b"last\n"
+        return StreamingResponse(body())
+
+    before = _observed_seconds("/stream/{name}")
+    response = TestClient(app).get("/stream/slow")
+    assert response.text == "first\nlast\n"
+    assert _observed_seconds("/stream/{name}") - before >= 0.2
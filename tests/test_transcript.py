@@ -0,0 +1,39 @@
+from src.gong.transcript import chunk_lines, count_tokens, flatten_transcript
+
+
+def _monologue(speaker: str, *sentences: str) -> dict:
+    return {"speakerId": speaker, "sentences": [{"text": text} for text in sentences]}
+
+
+def test_flatten_transcript_merges_consecutive_turns_of_a_speaker():
+    transcript = [{"transcript": [
+        _monologue("111", "Hi there."),
+        _monologue("111", "We need SSO."),
+        _monologue("222", " "),
+        _monologue("222", "Noted."),
+        _monologue("111", "Thanks."),
+    ]}]
+    assert flatten_transcript(transcript) == ["S1: Hi there. We need SSO.", "S2: Noted.", "S1: Thanks."]
+
+
+def test_chunks_stay_within_the_token_budget_and_keep_every_line():
+    lines = [f"S{i % 2 + 1}: line number {i} about exports" for i in range(40)]
+    chunks = chunk_lines(lines, max_tokens=60)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 60 + len(chunk.splitlines()) for chunk in chunks)
+    assert [line for chunk in chunks for line in chunk.splitlines()] == lines
+
+
+def test_chunks_repeat_the_tail_of_the_previous_chunk():
+    lines = [f"S1: sentence {i} with a few more words" for i in range(20)]
+    chunks = chunk_lines(lines, max_tokens=60, overlap_tokens=15)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.splitlines()[0] in previous.splitlines()
+    assert set(lines) == {line for chunk in chunks for line in chunk.splitlines()}
+
+
+def test_line_longer_than_the_budget_is_split_on_words():
+    line = " ".join(f"word{i}" for i in range(200))
+    chunks = chunk_lines([line], max_tokens=50)
+    assert len(chunks) > 1
+    assert " ".join(chunks).split() == line.split()